@@ -24,3 +24,10 @@ def types(session):
     session.install(".")
     session.install("mypy")
     session.run("mypy", "src", "tests")
+
+@nox.session(python=python_versions[0])
+def benchmark(session):
+    session.install(".")
+    session.run(
+        "python", "-m", "tests.benchmarks.bench_report_ftk_extents", *session.posargs
+    )
@@ -0,0 +1,53 @@
+import json
+import pathlib
+from concurrent.futures import Executor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Iterator, Union
+
+
+def run_batch(
+    executor: Executor,
+    worker: Callable[..., tuple[Any, Union[str, None]]],
+    items: Iterable,
+    *args
+) -> Iterator[tuple[Any, Any, Union[str, None]]]:
+
+    '''
+    submits worker(item, *args) for every item and yields each item with
+    its result and error as soon as it is done. Workers return a tuple of
+    result and error, so that one bad item does not stop the batch.
+    The executor is shut down once every item is done.
+    '''
+
+    with executor:
+        futures = {executor.submit(worker, item, *args): item for item in items}
+        for future in as_completed(futures):
+            try:
+                result, error = future.result()
+            except BrokenProcessPool as e:
+                # a worker died, every unfinished item is lost with it
+                result, error = None, f'BrokenProcessPool: {e}'
+            yield futures[future], result, error
+
+
+def write_batch_summary(
+    destination: pathlib.Path,
+    succeeded: dict,
+    failed: dict[Any, str],
+    name: str = 'batch_summary.json'
+) -> pathlib.Path:
+
+    '''
+    records the outcome of every item in a batch in destination.
+    Returns the path of the summary file.
+    '''
+
+    summary_path = pathlib.Path(destination) / name
+    summary = {
+        'succeeded': {str(k): str(v) for k, v in succeeded.items()},
+        'failed': {str(k): v for k, v in failed.items()}
+    }
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    return summary_path
@@ -0,0 +1,103 @@
+import logging
+import pathlib
+from typing import Union
+
+ZERO_BYTE = '0-byte file'
+HIDDEN = 'hidden file'
+SYMLINK = 'symlink'
+
+DEFAULT_SAMPLE_SIZE = 10
+
+
+class FileWarnings:
+
+    '''
+    collects warnings about individual files, such as 0-byte and hidden
+    files, so that a folder of thousands of them does not log thousands
+    of lines. Files are counted by group, such as an ER or a package, and
+    by category, and only sample_size paths of each are kept.
+    When a group is logged and every category fits in the sample, each
+    file is logged with its category's message from messages. Otherwise
+    the group gets a single summary line. With sidecar, every path is
+    also written to that file as tab separated group, category and path.
+    '''
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        messages: Union[dict[str, str], None] = None,
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        sidecar: Union[pathlib.Path, None] = None
+    ) -> None:
+        self.logger = logger
+        # formatted with group and path, only when the file is logged
+        self.messages = messages or {}
+        self.sample_size = sample_size
+        self.sidecar = sidecar
+        self._sidecar_file = None
+        self._groups = {}
+        if sidecar:
+            # only written if there is something to list, so clear old lists
+            pathlib.Path(sidecar).unlink(missing_ok=True)
+
+    def add(
+        self,
+        group: str,
+        category: str,
+        path: str
+    ) -> None:
+        counts, samples = self._groups.setdefault(group, ({}, {}))
+        counts[category] = counts.get(category, 0) + 1
+        sample = samples.setdefault(category, [])
+        if len(sample) < self.sample_size:
+            sample.append(path)
+
+        if self.sidecar:
+            if self._sidecar_file is None:
+                self._sidecar_file = open(self.sidecar, 'w', encoding='utf-8')
+            self._sidecar_file.write(f'{group}\t{category}\t{path}\n')
+
+    def log_group(
+        self,
+        group: str
+    ) -> None:
+        counts, samples = self._groups.pop(group, ({}, {}))
+        if not counts:
+            return None
+
+        if all(
+            count <= self.sample_size and category in self.messages
+            for category, count in counts.items()
+        ):
+            for category, paths in samples.items():
+                for path in paths:
+                    self.logger.warning(
+                        self.messages[category].format(group=group, path=path)
+                    )
+            return None
+
+        found = ' and '.join(
+            f'{count} {category}{"" if count == 1 else "s"}'
+            for category, count in counts.items()
+        )
+        message = f'{group} contains {found}'
+        examples = ', '.join(path for paths in samples.values() for path in paths)
+        if examples:
+            message += f', including: {examples}'
+        message += '. Review these files with the processing archivist.'
+        if self.sidecar:
+            message += f' All of them are listed in {self.sidecar}.'
+        self.logger.warning(message)
+
+        return None
+
+    def close(self) -> None:
+        if self._sidecar_file is not None:
+            self._sidecar_file.close()
+            self._sidecar_file = None
+
+    def __enter__(self) -> 'FileWarnings':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
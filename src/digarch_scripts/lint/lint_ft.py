@@ -3,7 +3,9 @@ import logging
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
+
+from ..file_warnings import DEFAULT_SAMPLE_SIZE, HIDDEN, ZERO_BYTE, FileWarnings
 
 LOGGER = logging.getLogger(__name__)
 
@@ -61,6 +63,19 @@ def parse_args() -> argparse.Namespace:
         or it will be saved in current directory''',
         default='.'
     )
+    parser.add_argument(
+        '--warning_sample',
+        help='''Optional. Number of hidden and zero bytes files named
+        as examples in the one line logged for each package''',
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE
+    )
+    parser.add_argument(
+        '--list_file_warnings',
+        help='''Optional. Write every hidden and zero bytes file
+        to a tsv file next to the log file''',
+        action='store_true'
+    )
 
 
     return parser.parse_args()
@@ -98,29 +113,33 @@ def package_has_valid_subfolder_names(package: Path) -> bool:
         )
         return False
 
-def package_has_no_hidden_file(package: Path) -> bool:
+def package_has_no_hidden_file(
+    package: Path, file_warnings: Optional[FileWarnings] = None
+) -> bool:
     """The package should not have any hidden file"""
-    hidden_ls = [
-        h
-        for h in package.rglob("*")
-        if h.name.startswith(".") or h.name.startswith("Thumbs")
-    ]
-    if hidden_ls:
-        LOGGER.warning(f"{package.name} has hidden files {hidden_ls}")
-        return False
-    else:
-        return True
-
-def package_has_no_zero_bytes_file(package: Path) -> bool:
+    file_warnings = file_warnings or FileWarnings(LOGGER)
+    found = False
+    for h in package.rglob("*"):
+        if h.name.startswith(".") or h.name.startswith("Thumbs"):
+            file_warnings.add(package.name, HIDDEN, str(h))
+            found = True
+    file_warnings.log_group(package.name)
+
+    return not found
+
+def package_has_no_zero_bytes_file(
+    package: Path, file_warnings: Optional[FileWarnings] = None
+) -> bool:
     """The package should not have any zero bytes file"""
-    all_file = [ f for f in package.rglob("*") if f.is_file() ]
-    zero_bytes_ls = [ f for f in all_file if f.stat().st_size == 0 ]
+    file_warnings = file_warnings or FileWarnings(LOGGER)
+    found = False
+    for f in package.rglob("*"):
+        if f.is_file() and f.stat().st_size == 0:
+            file_warnings.add(package.name, ZERO_BYTE, str(f))
+            found = True
+    file_warnings.log_group(package.name)
 
-    if zero_bytes_ls:
-        LOGGER.warning(f"{package.name} has zero bytes file {zero_bytes_ls}")
-        return False
-    else:
-        return True
+    return not found
 
 def metadata_folder_is_flat(package: Path) -> bool:
     """The metadata folder should not have folder structure"""
@@ -202,20 +221,24 @@ def objects_folder_has_no_empty_folder(package: Path) -> bool:
     else:
         return True
 
-def lint_package(package: Path) -> Literal["valide", "invalide", "needs review"]:
+def lint_package(
+    package: Path, file_warnings: Optional[FileWarnings] = None
+) -> Literal["valide", "invalide", "needs review"]:
     """Run all linting tests against a package"""
     result = "valid"
 
-    less_strict_tests = [
+    file_tests = [
         package_has_no_hidden_file,
-        package_has_no_zero_bytes_file,
-        metadata_folder_has_files
+        package_has_no_zero_bytes_file
     ]
 
-    for test in less_strict_tests:
-        if not test(package):
+    for test in file_tests:
+        if not test(package, file_warnings):
             result = "needs review"
 
+    if not metadata_folder_has_files(package):
+        result = "needs review"
+
     strict_tests = [
         package_has_valid_name,
         package_has_two_subfolders,
@@ -242,15 +265,24 @@ def main():
 
     counter = 0
 
-    for package in args.packages:
-        counter += 1
-        result = lint_package(package)
-        if result == "valid":
-            valid.append(package.name)
-        elif result == "invalid":
-            invalid.append(package.name)
-        else:
-            needs_review.append(package.name)
+    sidecar = None
+    if args.list_file_warnings:
+        sidecar = Path(args.log_folder) / datetime.now().strftime(
+            "lint_file_warnings_%Y_%m_%d_%H_%M.tsv"
+        )
+    # without per-file messages, each package is always one summary line
+    file_warnings = FileWarnings(LOGGER, sample_size=args.warning_sample, sidecar=sidecar)
+
+    with file_warnings:
+        for package in args.packages:
+            counter += 1
+            result = lint_package(package, file_warnings)
+            if result == "valid":
+                valid.append(package.name)
+            elif result == "invalid":
+                invalid.append(package.name)
+            else:
+                needs_review.append(package.name)
     print(f"\nTotal packages ran: {counter}")
     if valid:
         print(
@@ -1,15 +1,49 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import contextlib
+import csv
 from datetime import date
+import errno
+import hashlib
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 from pathlib import Path
 import re
+import shutil
+import sqlite3
+import threading
+from typing import Iterator, NamedTuple, Optional
 
 import bagit
 
+from ..batch import run_batch, write_batch_summary
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+CARRIER_ID_PATTERN = r"ACQ_\d{4}_\d{6}"
+
+# columns of a batch csv, each row may also have its own dest
+BATCH_COLUMNS = ["id", "payload", "log", "md5"]
+# carriers moving or hashing files on one destination filesystem at a time
+DEFAULT_IO_PER_FILESYSTEM = 2
+
+# read size when hashing payload files
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+# bytes of small files hashed together by one fixity worker task
+FIXITY_GROUP_SIZE = 64 * 1024 * 1024
+
+# md5sum lines are the digest, a space, a space or * for binary mode, and the path
+MD5_LINE = re.compile(r"([0-9a-fA-F]{32}) [ *](.+)")
+
+# the write-ahead journal of an unfinished run, kept in the package folder
+JOURNAL_NAME = "package_cloud_journal.jsonl"
+# moves journaled per write, so a huge payload isn't one fsync per file
+JOURNAL_BATCH_SIZE = 1000
+
 
 def parse_args() -> argparse.Namespace:
     def extant_path(p: str) -> Path:
@@ -19,25 +53,74 @@ def parse_args() -> argparse.Namespace:
         return path
 
     def digital_carrier_label(id: str) -> Path:
-        pattern = r"ACQ_\d{4}_\d{6}"
-        if not re.match(r"ACQ_\d{4}_\d{6}", id):
+        pattern = CARRIER_ID_PATTERN
+        if not re.match(pattern, id):
             raise argparse.ArgumentTypeError(
                 f"{id} does not match the expected {type} pattern, {pattern}"
             )
         return id
 
-    parser = argparse.ArgumentParser(description="test")
-    parser.add_argument("--payload", required=True, type=extant_path)
-    parser.add_argument("--log", required=True, type=extant_path)
-    parser.add_argument("--md5", required=True, type=extant_path)
+    modes = argparse.ArgumentParser(add_help=False)
+    mode = modes.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--resume",
+        action="store_true",
+        help="finish an interrupted run for --id, the other paths are read from its journal",
+    )
+    mode.add_argument(
+        "--rollback",
+        action="store_true",
+        help="undo an unfinished run for --id, moving every file back to its source",
+    )
+    mode.add_argument(
+        "--batch",
+        type=extant_path,
+        help="csv with id, payload, log and md5 columns, and optionally dest, "
+        "to package a carrier per row",
+    )
+    # the source paths may already be gone when resuming or rolling back,
+    # and a batch has them in its csv
+    chosen = modes.parse_known_args()[0]
+    required = not (chosen.resume or chosen.rollback or chosen.batch)
+
+    parser = argparse.ArgumentParser(description="test", parents=[modes])
+    parser.add_argument("--payload", required=required, type=extant_path)
+    parser.add_argument("--log", required=required, type=extant_path)
+    parser.add_argument("--md5", required=required, type=extant_path)
     parser.add_argument("--dest", required=True, type=extant_path)
-    parser.add_argument("--id", required=True, type=digital_carrier_label)
+    parser.add_argument("--id", required=not chosen.batch, type=digital_carrier_label)
+    parser.add_argument(
+        "--no-fixity",
+        action="store_true",
+        help="only check that the bag is complete, without hashing the payload",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of processes hashing the payload, default is the number of CPUs",
+    )
+    parser.add_argument(
+        "--batch-workers",
+        type=int,
+        default=4,
+        help="number of carriers packaged at once in a batch",
+    )
+    parser.add_argument(
+        "--io-per-filesystem",
+        type=int,
+        default=DEFAULT_IO_PER_FILESYSTEM,
+        help="number of carriers in a batch moving or hashing files on the same "
+        "destination filesystem at once",
+    )
 
     return parser.parse_args()
 
-def create_base_dir(dest: Path, id: str) -> Path:
+def get_package_dir(dest: Path, id: str) -> Path:
     acq_id = id.rsplit("_", 1)[0]
-    package_base = dest / acq_id / id
+    return dest / acq_id / id
+
+def create_base_dir(dest: Path, id: str) -> Path:
+    package_base = get_package_dir(dest, id)
     if package_base.exists():
         raise FileExistsError(
             f"{package_base} already exists. Make sure you are using the correct ID"
@@ -49,66 +132,474 @@ def create_base_dir(dest: Path, id: str) -> Path:
         raise PermissionError(f"{dest} is not writable")
     return package_base
 
-def move_metadata_file(md_path: Path, pkg_dir: Path) -> None:
+def move_metadata_file(
+    md_path: Path, pkg_dir: Path, journal: Optional["Journal"] = None
+) -> None:
     md_dir = pkg_dir / "metadata"
     if not md_dir.exists():
         md_dir.mkdir()
 
     new_md_path = md_dir / md_path.name
-    if new_md_path.exists():
-        raise FileExistsError(f"{new_md_path} already exists. Not moving.")
-
-    md_path.rename(new_md_path)
+    move_batch([(md_path, new_md_path)], journal)
+    if journal:
+        journal.flush()
     return None
 
 def create_bag_in_objects(payload_path: Path, md5_path: Path, pkg_dir: Path) -> None:
     bag_dir = pkg_dir / "objects"
     bag_dir.mkdir()
-    move_payload(payload_path, bag_dir)
-    convert_to_bagit_manifest(md5_path, bag_dir)
+    move_payload(payload_path, bag_dir, md5_path)
+    manifest_count = convert_to_bagit_manifest(md5_path, bag_dir)
     # generate baginfo.txt and bagit.txt (copying code snippet from bagit)
-    create_bag_tag_files(bag_dir)
+    create_bag_tag_files(bag_dir, manifest_count)
     return None
 
-def move_payload(payload_path: Path, bag_dir: Path) -> None:
+def move_payload(
+    payload_path: Path,
+    bag_dir: Path,
+    md5_path: Optional[Path] = None,
+    journal: Optional["Journal"] = None,
+) -> None:
     #instantiate a var for objects dir
     payload_dir = bag_dir / "data"
     #if the object folder does not exist create it
     if not payload_dir.exists():
         payload_dir.mkdir(parents=True)
-    else:
+    elif not (journal and journal.resuming):
         raise FileExistsError(f"{payload_dir} already exists. Not moving files.")
 
-    for a_file in payload_path.iterdir():
-        new_ob_path = payload_dir / a_file.name
-        #if a payload file is already in the object directory do not move, raise error
-        if new_ob_path.exists():
-             raise FileExistsError(f"{new_ob_path} already exists. Not moving.")
-
-        a_file.rename(new_ob_path)
+    checksums = None
+    payload_files = payload_path.iterdir()
+    try:
+        while True:
+            batch = [
+                (a_file, payload_dir / a_file.name)
+                for a_file in itertools.islice(payload_files, JOURNAL_BATCH_SIZE)
+            ]
+            if not batch:
+                break
+            checksums = move_batch(batch, journal, md5_path, checksums)
+    finally:
+        if checksums:
+            checksums.close()
+
+    if journal:
+        journal.flush()
     return None
 
-def convert_to_bagit_manifest(md5_path: Path, bag_dir: Path) -> None:
+
+def move_batch(
+    moves: list[tuple[Path, Path]],
+    journal: Optional["Journal"] = None,
+    md5_path: Optional[Path] = None,
+    checksums: Optional["Md5Index"] = None,
+) -> Optional["Md5Index"]:
+    """Move each source to its destination. With a journal, the whole batch is
+    journaled as planned before anything moves, and moves that an interrupted
+    run had planned are finished. Returns the md5 index if it had to be read"""
+    for src, dest in moves:
+        #if a file is already in the destination do not move, raise error
+        if os.path.lexists(dest) and not (journal and journal.is_pending(src)):
+            raise FileExistsError(f"{dest} already exists. Not moving.")
+
+    if journal:
+        journal.plan(moves)
+
+    for src, dest in moves:
+        if journal and journal.is_pending(src) and not os.path.lexists(src):
+            #moved before the interrupted run could journal it
+            pass
+        elif os.path.lexists(dest):
+            #an interrupted copy to another filesystem, the source is still complete
+            if checksums is None:
+                checksums = Md5Index(md5_path) if md5_path else None
+            move_across_devices(src, dest, checksums, resume=True)
+        else:
+            try:
+                src.rename(dest)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                #only read the manifest once the payload has to be copied
+                if checksums is None:
+                    checksums = Md5Index(md5_path) if md5_path else None
+                move_across_devices(src, dest, checksums)
+
+        if journal:
+            journal.done(src)
+
+    return checksums
+
+def convert_to_bagit_manifest(md5_path: Path, bag_dir: Path) -> int:
+    """Rewrite the rclone md5 file as the bag manifest one line at a time,
+    so the manifest never has to fit in memory. Returns the number of entries"""
     #check for manifest
     new_md5_path = bag_dir / "manifest-md5.txt"
     if new_md5_path.exists():
         raise FileExistsError("manifest-md5.txt already exists, review package")
 
-    with open(md5_path, "r") as f:
-        manifest_data = f.readlines()
+    #write to a temp file so a failed conversion never leaves a partial manifest
+    tmp_md5_path = bag_dir / f".manifest-md5.txt.{os.getpid()}.tmp"
+    entries = 0
+    try:
+        with open(md5_path, "r", encoding="utf-8") as src_f, open(
+            tmp_md5_path, "x", encoding="utf-8", newline="\n", buffering=1024 * 1024
+        ) as dest_f:
+            for line_number, line in enumerate(src_f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    digest, path = parse_md5_line(line)
+                except ValueError as e:
+                    raise ValueError(f"{md5_path}, line {line_number}: {e}")
+                dest_f.write(f"{digest}  data/{bagit._encode_filename(path)}\n")
+                entries += 1
+            dest_f.flush()
+            os.fsync(dest_f.fileno())
+
+        tmp_md5_path.rename(new_md5_path)
+    except BaseException:
+        tmp_md5_path.unlink(missing_ok=True)
+        raise
+
+    md5_path.unlink()
+    return entries
+
+
+def parse_md5_line(line: str) -> tuple[str, str]:
+    match = MD5_LINE.fullmatch(line.rstrip("\r\n"))
+    if not match:
+        raise ValueError(f"{line!r} is not a valid md5 manifest line")
+    return match.group(1).lower(), match.group(2)
+
+
+class Md5Index:
+    """The digests of an rclone md5 file, indexed by path in a temporary
+    SQLite database so the manifest never has to fit in memory"""
+
+    def __init__(self, md5_path: Path) -> None:
+        #an empty name is a private database on disk, deleted on close
+        self._conn = sqlite3.connect("")
+        self._conn.execute("CREATE TABLE checksums (path TEXT PRIMARY KEY, md5 TEXT)")
+        with open(md5_path, "r", encoding="utf-8") as f, self._conn:
+            entries = (parse_md5_line(line) for line in f if line.strip())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?)",
+                ((path, digest) for digest, path in entries),
+            )
+
+    def get(self, path: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT md5 FROM checksums WHERE path = ?", (path,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def write_md5_file(manifest_path: Path, md5_path: Path) -> None:
+    """Turn a bag manifest back into an rclone md5 file"""
+    tmp_md5_path = md5_path.with_name(f".{md5_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as src_f, open(
+            tmp_md5_path, "x", encoding="utf-8", newline="\n", buffering=1024 * 1024
+        ) as dest_f:
+            for line in src_f:
+                if not line.strip():
+                    continue
+                digest, path = parse_md5_line(line)
+                path = bagit._decode_filename(path).removeprefix("data/")
+                dest_f.write(f"{digest}  {path}\n")
+        tmp_md5_path.rename(md5_path)
+    except BaseException:
+        tmp_md5_path.unlink(missing_ok=True)
+        raise
+
+    return None
+
+
+def count_lines(path: Path) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class Journal:
+    """A write-ahead journal of a packaging run, as JSON lines. Moves are
+    journaled as planned before they happen and as done afterwards, a batch
+    at a time, and finished steps are journaled as they finish. Opening an
+    existing journal loads the run so it can be resumed or rolled back"""
+
+    def __init__(self, path: Path, batch_size: int = JOURNAL_BATCH_SIZE) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.resuming = path.exists()
+        self.run = {}
+        self.steps = {}
+        # planned moves that aren't journaled as done, by source
+        self._pending = {}
+        self._done = []
+        if self.resuming:
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        with open(self.path, "rb+") as f:
+            end = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    #the interrupted run was partway through this record
+                    break
+                self._apply(json.loads(line))
+                end += len(line)
+            f.truncate(end)
+
+    def _apply(self, record: dict) -> None:
+        if record["event"] == "start":
+            self.run = record
+        elif record["event"] == "plan":
+            self._pending.update(record["moves"])
+        elif record["event"] == "done":
+            for src in record["sources"]:
+                self._pending.pop(src, None)
+        elif record["event"] == "step":
+            self.steps[record["step"]] = record
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, **run: str) -> None:
+        self.run = {"event": "start", **run}
+        self._write(self.run)
+
+    def plan(self, moves: list[tuple[Path, Path]]) -> None:
+        moves = [[str(src), str(dest)] for src, dest in moves]
+        self._pending.update(moves)
+        self._write({"event": "plan", "moves": moves})
+
+    def is_pending(self, src: Path) -> bool:
+        return str(src) in self._pending
+
+    def done(self, src: Path) -> None:
+        self._pending.pop(str(src), None)
+        self._done.append(str(src))
+        if len(self._done) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._done:
+            self._write({"event": "done", "sources": self._done})
+            self._done = []
+
+    def step(self, name: str, **fields) -> None:
+        self.flush()
+        self.steps[name] = {"event": "step", "step": name, **fields}
+        self._write(self.steps[name])
+
+    def planned_moves(self) -> Iterator[tuple[Path, Path]]:
+        """Every move any run planned, done or not, read back from the file"""
+        self.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["event"] == "plan":
+                    for src, dest in record["moves"]:
+                        yield Path(src), Path(dest)
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def remove(self) -> None:
+        self.close()
+        self.path.unlink()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if not self._file.closed:
+            self.close()
+
+
+def package_files(
+    base_dir: Path, payload_path: Path, log_path: Path, md5_path: Path, journal: Journal
+) -> None:
+    """Run every packaging step the journal doesn't list as finished"""
+    bag_dir = base_dir / "objects"
+    if "metadata" not in journal.steps:
+        move_metadata_file(log_path, base_dir, journal)
+        journal.step("metadata")
+
+    if "payload" not in journal.steps:
+        bag_dir.mkdir(exist_ok=journal.resuming)
+        move_payload(payload_path, bag_dir, md5_path, journal)
+        journal.step("payload")
+
+    if "manifest" not in journal.steps:
+        #left by a conversion the interrupted run didn't finish
+        for tmp_file in bag_dir.glob(".manifest-md5.txt.*.tmp"):
+            tmp_file.unlink()
+        manifest_path = bag_dir / "manifest-md5.txt"
+        if manifest_path.exists():
+            #converted, but the run stopped before it was journaled
+            entries = count_lines(manifest_path)
+            md5_path.unlink(missing_ok=True)
+        else:
+            entries = convert_to_bagit_manifest(md5_path, bag_dir)
+        journal.step("manifest", entries=entries)
+
+    # generate baginfo.txt and bagit.txt (copying code snippet from bagit)
+    create_bag_tag_files(bag_dir, journal.steps["manifest"]["entries"])
+    return None
+
+
+def restore_path(moved: Path, original: Path) -> None:
+    """Move a file or folder back to where it came from. If the original
+    still exists, moved is an unfinished copy and only what was already
+    deleted from the original is moved back"""
+    if not os.path.lexists(moved):
+        return None
+
+    if not os.path.lexists(original):
+        move(moved, original)
+    elif is_real_dir(moved) and is_real_dir(original):
+        for child in moved.iterdir():
+            restore_path(child, original / child.name)
+        moved.rmdir()
+    else:
+        remove_path(moved)
+
+    return None
+
+
+def rollback_package(base_dir: Path) -> None:
+    journal_path = base_dir / JOURNAL_NAME
+    if not journal_path.exists():
+        raise FileNotFoundError(
+            f"{journal_path} does not exist. Only unfinished runs can be rolled back"
+        )
+
+    with Journal(journal_path) as journal:
+        bag_dir = base_dir / "objects"
+        manifest_path = bag_dir / "manifest-md5.txt"
+        md5_path = Path(journal.run["md5"])
+        if manifest_path.exists() and not md5_path.exists():
+            write_md5_file(manifest_path, md5_path)
 
-    updated_manifest = [
-        line.replace("  ", "  data/") for line in manifest_data
-    ]
-    #re-writes the manifest lines
-    with open(md5_path, "w") as f:
-        f.writelines(updated_manifest)
-    #move md5 file to manifest-md5.txt in bag
-    md5_path.rename(new_md5_path)
+        for src, dest in journal.planned_moves():
+            restore_path(dest, src)
 
+        for tag_file in ["manifest-md5.txt", "bagit.txt", "bag-info.txt"]:
+            (bag_dir / tag_file).unlink(missing_ok=True)
+        for tmp_file in bag_dir.glob(".manifest-md5.txt.*.tmp"):
+            tmp_file.unlink()
+        for folder in [bag_dir / "data", bag_dir, base_dir / "metadata"]:
+            if folder.exists():
+                folder.rmdir()
+
+        journal.remove()
+
+    base_dir.rmdir()
+    LOGGER.info(f"{base_dir} was rolled back. Files are back in their sources.")
+    return None
+
+
+def move(src: Path, dest: Path) -> None:
+    try:
+        src.rename(dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        move_across_devices(src, dest)
     return None
 
-def create_bag_tag_files(bag_dir: Path):
+
+def move_across_devices(
+    src: Path,
+    dest: Path,
+    checksums: Optional["Md5Index"] = None,
+    rel_path: Optional[str] = None,
+    resume: bool = False,
+) -> None:
+    """Copy src to dest on another filesystem and then delete src.
+    Files listed in checksums, by their path relative to src's parent,
+    are verified before they are deleted. With resume, whatever an
+    interrupted copy left at dest is replaced"""
+    rel_path = rel_path or src.name
+
+    if resume and os.path.lexists(dest) and not (is_real_dir(src) and is_real_dir(dest)):
+        remove_path(dest)
+
+    if src.is_symlink():
+        os.symlink(os.readlink(src), dest)
+    elif is_real_dir(src):
+        dest.mkdir(exist_ok=resume)
+        for child in src.iterdir():
+            move_across_devices(
+                child, dest / child.name, checksums, f"{rel_path}/{child.name}", resume
+            )
+        shutil.copystat(src, dest)
+        src.rmdir()
+        return None
+    else:
+        copy_file(src, dest, checksums.get(rel_path) if checksums else None)
+
+    src.unlink()
+    return None
+
+
+def is_real_dir(path: Path) -> bool:
+    return path.is_dir() and not path.is_symlink()
+
+
+def remove_path(path: Path) -> None:
+    if is_real_dir(path):
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+    return None
+
+
+def copy_file(src: Path, dest: Path, md5: Optional[str] = None) -> str:
+    """Copy src to dest, hashing each block between reading and writing it,
+    so every byte is read once. If md5 is given and the copy doesn't match,
+    the copy is deleted and a ValueError is raised. Returns the md5"""
+    with open(src, "rb", buffering=0) as src_f:
+        dest_f = open(dest, "xb", buffering=0)
+        try:
+            with dest_f:
+                digest = _copy_hashing(src_f, dest_f)
+            if md5 and digest != md5.lower():
+                raise ValueError(
+                    f"{dest} has md5 {digest} but the manifest lists {md5}. "
+                    f"Not moving {src}."
+                )
+            shutil.copystat(src, dest)
+        except BaseException:
+            dest.unlink(missing_ok=True)
+            raise
+
+    return digest
+
+
+def _copy_hashing(src_f, dest_f) -> str:
+    md5 = hashlib.md5()
+    view = read_buffer(os.fstat(src_f.fileno()).st_size)
+    while True:
+        size = src_f.readinto(view)
+        if not size:
+            break
+        md5.update(view[:size])
+        written = 0
+        while written < size:
+            written += dest_f.write(view[written:size])
+
+    return md5.hexdigest()
+
+def create_bag_tag_files(bag_dir: Path, manifest_count: Optional[int] = None):
     txt = """BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8\n"""
     with open(bag_dir / "bagit.txt", "w") as bagit_file:
         bagit_file.write(txt)
@@ -117,6 +608,11 @@ def create_bag_tag_files(bag_dir: Path):
     bag_info["Bagging-Date"] = date.strftime(date.today(), "%Y-%m-%d")
     bag_info["Bag-Software-Agent"] = "package_cloud.py"
     total_bytes, total_files = get_oxum(bag_dir / "data")
+    if manifest_count is not None and manifest_count != total_files:
+        raise ValueError(
+            f"The manifest lists {manifest_count} files but the payload has "
+            f"{total_files}. Review package"
+        )
     bag_info["Payload-Oxum"] = f"{total_bytes}.{total_files}"
     bagit._make_tag_file(bag_dir / "bag-info.txt", bag_info)
 
@@ -133,24 +629,356 @@ def get_oxum(payload_dir: Path) -> (int, int):
     return total_bytes, total_files
 
 
-def validate_bag_in_payload(pkg_dir: Path) -> None:
+class FixityReport(NamedTuple):
+    mismatched: list[str]
+    missing: list[str]
+    extra: list[str]
+
+
+# each thread's read buffer, allocated once and reused for every file
+_buffers = threading.local()
+
+
+def read_buffer(file_size: int) -> memoryview:
+    """This thread's read buffer, cut to file_size so small files don't read
+    into more of it than they need"""
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != HASH_BUFFER_SIZE:
+        buffer = _buffers.buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+    return buffer[: max(min(file_size, HASH_BUFFER_SIZE), 1)]
+
+
+def hash_file(path: Path, algorithms: list[str]) -> dict[str, str]:
+    hashes = [hashlib.new(alg) for alg in algorithms]
+    with open(path, "rb", buffering=0) as f:
+        view = read_buffer(os.fstat(f.fileno()).st_size)
+        while True:
+            size = f.readinto(view)
+            if not size:
+                break
+            for h in hashes:
+                h.update(view[:size])
+
+    return {alg: h.hexdigest() for alg, h in zip(algorithms, hashes)}
+
+
+def hash_files(files: list[tuple[Path, list[str]]]) -> list[dict[str, str]]:
+    return [hash_file(path, algorithms) for path, algorithms in files]
+
+
+def _group_files(
+    paths: list[str], sizes: dict[str, int]
+) -> Iterator[list[str]]:
+    """Group files, largest first, so each group has a file of at least
+    FIXITY_GROUP_SIZE or enough smaller files to add up to it"""
+    group = []
+    group_size = 0
+    for path in sorted(paths, key=sizes.get, reverse=True):
+        group.append(path)
+        group_size += sizes[path]
+        if group_size >= FIXITY_GROUP_SIZE:
+            yield group
+            group = []
+            group_size = 0
+    if group:
+        yield group
+
+
+def verify_fixity(bag: bagit.Bag, workers: Optional[int] = None) -> FixityReport:
+    """Hash every payload file in a pool of processes, largest files first
+    and small files in groups, and compare the results with the bag's
+    manifests"""
+    entries = {
+        bagit.normalize_unicode(path): hashes
+        for path, hashes in bag.payload_entries().items()
+    }
+    payload = {
+        bagit.normalize_unicode(path): path for path in bag.payload_files()
+    }
+    missing = sorted(set(entries) - set(payload))
+    extra = sorted(payload[path] for path in set(payload) - set(entries))
+
+    sizes = {
+        path: os.stat(os.path.join(bag.path, payload[path])).st_size
+        for path in set(payload) & set(entries)
+    }
+    mismatched = []
+    #batch mode verifies from threads, which a forked worker must not copy
+    context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                hash_files,
+                [
+                    (Path(bag.path) / payload[path], sorted(entries[path]))
+                    for path in group
+                ],
+            ): group
+            for group in _group_files(list(sizes), sizes)
+        }
+        for future in as_completed(futures):
+            for path, hashes in zip(futures[future], future.result()):
+                if hashes != {
+                    alg: digest.lower() for alg, digest in entries[path].items()
+                }:
+                    mismatched.append(payload[path])
+
+    return FixityReport(sorted(mismatched), missing, extra)
+
+
+def validate_bag_in_payload(
+    pkg_dir: Path, fixity: bool = True, workers: Optional[int] = None
+) -> bool:
     bag_dir = pkg_dir / "objects"
     bag = bagit.Bag(str(bag_dir))
     try:
         bag.validate(completeness_only=True)
-        LOGGER.info(f"{bag.path} is valid.")
     except bagit.BagValidationError:
         LOGGER.warn(f"{bag.path} is not valid. Check the bag manifest and oxum.")
-    return None
+        return False
+
+    if fixity:
+        report = verify_fixity(bag, workers)
+        for path in report.mismatched:
+            LOGGER.warning(f"{path} does not match its checksum in the manifest")
+        for path in report.missing:
+            LOGGER.warning(f"{path} is in the manifest but not in the payload")
+        for path in report.extra:
+            LOGGER.warning(f"{path} is in the payload but not in the manifest")
+        if any(report):
+            LOGGER.warning(
+                f"{bag.path} is not valid. Check the bag manifest and oxum."
+            )
+            return False
+
+    LOGGER.info(f"{bag.path} is valid.")
+    return True
+
+
+class BatchItem(NamedTuple):
+    id: str
+    payload: Path
+    log: Path
+    md5: Path
+    dest: Path
+
+
+def read_batch_csv(csv_path: Path, dest: Path) -> list[BatchItem]:
+    """Read and check every row of a batch csv before anything is moved, so a
+    bad row can't stop the batch partway. Raises a ValueError listing every
+    problem found"""
+    items = []
+    problems = []
+    ids = set()
+    paths = set()
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [col for col in BATCH_COLUMNS if col not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{csv_path} is missing the columns {', '.join(missing)}")
+
+        for row_number, row in enumerate(reader, 2):
+            row = {key: (value or "").strip() for key, value in row.items() if key}
+            row_problems = []
+            if not re.match(CARRIER_ID_PATTERN, row["id"]):
+                row_problems.append(
+                    f"{row['id']} does not match the expected pattern, {CARRIER_ID_PATTERN}"
+                )
+            elif row["id"] in ids:
+                row_problems.append(f"{row['id']} is in the batch more than once")
+            ids.add(row["id"])
+
+            item_paths = {
+                col: Path(row[col]).absolute() for col in BATCH_COLUMNS[1:] + ["dest"]
+                if row.get(col)
+            }
+            item_paths.setdefault("dest", dest.absolute())
+            for col in BATCH_COLUMNS[1:]:
+                path = item_paths.get(col)
+                if not path:
+                    row_problems.append(f"{col} is empty")
+                elif not path.exists():
+                    row_problems.append(f"{path} does not exist")
+                elif path in paths:
+                    row_problems.append(f"{path} is used by another row")
+                elif col == "payload" and not path.is_dir():
+                    row_problems.append(f"{path} is not a folder")
+                if path:
+                    paths.add(path)
+
+            if not item_paths["dest"].is_dir():
+                row_problems.append(f"{item_paths['dest']} is not a folder")
+            elif not row_problems:
+                package_dir = get_package_dir(item_paths["dest"], row["id"])
+                if package_dir.exists():
+                    row_problems.append(
+                        f"{package_dir} already exists. Make sure you are using the correct ID"
+                    )
+
+            if row_problems:
+                problems.extend(f"row {row_number}: {problem}" for problem in row_problems)
+            else:
+                items.append(BatchItem(row["id"], **item_paths))
+
+    if problems:
+        raise ValueError(
+            f"{csv_path} has {len(problems)} problems, nothing was packaged:\n"
+            + "\n".join(problems)
+        )
+    return items
+
+
+def package_carrier(
+    id: str,
+    payload_path: Path,
+    log_path: Path,
+    md5_path: Path,
+    dest: Path,
+    fixity: bool = True,
+    workers: Optional[int] = None,
+    resume: bool = False,
+    throttle: Optional[threading.Semaphore] = None,
+) -> bool:
+    """Package one carrier with a journal, from scratch or by resuming an
+    interrupted run. Moving and hashing files only start once throttle is
+    acquired. Returns whether the bag is valid"""
+    # the journal has to find every path again from wherever a resume is run
+    base_dir = get_package_dir(dest.absolute(), id)
+    journal_path = base_dir / JOURNAL_NAME
+    if resume:
+        if not journal_path.exists():
+            raise FileNotFoundError(
+                f"{journal_path} does not exist. There is no unfinished run to resume"
+            )
+        journal = Journal(journal_path)
+        payload_path = Path(journal.run["payload"])
+        log_path = Path(journal.run["log"])
+        md5_path = Path(journal.run["md5"])
+    else:
+        if journal_path.exists():
+            raise FileExistsError(
+                f"{base_dir} has an unfinished run. Use --resume or --rollback"
+            )
+        base_dir = create_base_dir(dest.absolute(), id)
+        payload_path, log_path, md5_path = (
+            path.absolute() for path in (payload_path, log_path, md5_path)
+        )
+        journal = Journal(journal_path)
+        journal.start(
+            id=id, payload=str(payload_path), log=str(log_path), md5=str(md5_path)
+        )
+
+    with journal:
+        with throttle or contextlib.nullcontext():
+            package_files(base_dir, payload_path, log_path, md5_path, journal)
+            valid = validate_bag_in_payload(base_dir, fixity, workers)
+        if valid:
+            journal.remove()
+        else:
+            LOGGER.warning(
+                f"{base_dir} was kept for review. Use --rollback to return its files"
+            )
+
+    return valid
+
+
+def _package_batch_item(
+    item: BatchItem,
+    fixity: bool,
+    workers: Optional[int],
+    throttles: dict[int, threading.Semaphore],
+) -> tuple[Optional[bool], Optional[str]]:
+    """Worker for package_batch, returns whether the bag validated"""
+    try:
+        throttle = throttles[os.stat(item.dest).st_dev]
+        valid = package_carrier(
+            item.id,
+            item.payload,
+            item.log,
+            item.md5,
+            item.dest,
+            fixity,
+            workers,
+            throttle=throttle,
+        )
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    return valid, None
+
+
+def package_batch(
+    items: list[BatchItem],
+    batch_workers: Optional[int] = None,
+    io_per_filesystem: int = DEFAULT_IO_PER_FILESYSTEM,
+    fixity: bool = True,
+    workers: Optional[int] = None,
+) -> tuple[dict[str, Path], dict[str, str]]:
+    """Package carriers on a pool of batch_workers threads, with at most
+    io_per_filesystem of them moving or hashing files on each destination
+    filesystem at once. Returns dicts mapping each carrier id to its
+    package or to the reason it failed"""
+    throttles = {}
+    for item in items:
+        device = os.stat(item.dest).st_dev
+        throttles.setdefault(device, threading.BoundedSemaphore(io_per_filesystem))
+
+    succeeded = {}
+    failed = {}
+    batch = run_batch(
+        ThreadPoolExecutor(max_workers=batch_workers),
+        _package_batch_item, items, fixity, workers, throttles
+    )
+    for item, valid, error in batch:
+        if error:
+            LOGGER.error(f"{item.id} could not be packaged. {error}")
+            failed[item.id] = error
+        elif valid:
+            succeeded[item.id] = get_package_dir(item.dest, item.id)
+        else:
+            failed[item.id] = "the bag is not valid, review the package"
+
+    return succeeded, failed
 
 
 def main():
     args = parse_args()
 
-    base_dir = create_base_dir(args.dest, args.id)
-    move_metadata_file(args.log, base_dir)
-    create_bag_in_objects(args.payload, args.md5, base_dir)
-    validate_bag_in_payload(base_dir)
+    if args.batch:
+        items = read_batch_csv(args.batch, args.dest)
+        print(f"Packaging {len(items)} carriers ...")
+        succeeded, failed = package_batch(
+            items,
+            args.batch_workers,
+            args.io_per_filesystem,
+            not args.no_fixity,
+            args.workers,
+        )
+        summary_path = write_batch_summary(
+            args.dest,
+            dict(sorted(succeeded.items())),
+            dict(sorted(failed.items())),
+            "package_batch_summary.json",
+        )
+
+        print(f"{len(succeeded)} carriers packaged, {len(failed)} failed. See {summary_path}")
+        for id, error in sorted(failed.items()):
+            print(f"  {id}: {error}")
+        return None
+
+    if args.rollback:
+        rollback_package(get_package_dir(args.dest.absolute(), args.id))
+        return None
+
+    package_carrier(
+        args.id,
+        args.payload,
+        args.log,
+        args.md5,
+        args.dest,
+        not args.no_fixity,
+        args.workers,
+        args.resume,
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+from typing import NamedTuple, Union
+
+# Flags from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+# Everything that can change the files or folders inside a watched folder
+IN_CHANGES = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+# struct inotify_event without its variable length name
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyEvent(NamedTuple):
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+class Inotify:
+
+    '''
+    a minimal ctypes binding to the Linux inotify API, so watching a
+    folder tree needs no compiled dependency. Watches are not recursive,
+    each folder needs its own.
+    '''
+
+    def __init__(self) -> None:
+        libc_name = ctypes.util.find_library('c')
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError(
+                errno.ENOSYS, 'inotify is not available, watching needs Linux'
+            )
+
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise_errno('inotify_init1')
+
+    def _raise_errno(self, call: str, path: Union[str, None] = None) -> None:
+        err = ctypes.get_errno()
+        if err == errno.ENOSPC:
+            message = (
+                'inotify watch limit reached, '
+                'raise fs.inotify.max_user_watches to watch this many folders'
+            )
+        else:
+            message = f'{call} failed: {os.strerror(err)}'
+        raise OSError(err, message, path)
+
+    def add_watch(self, path: str, mask: int = IN_CHANGES | IN_ONLYDIR) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            self._raise_errno('inotify_add_watch', path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        # the watch is already gone if its folder was deleted
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: Union[float, None] = None) -> list[InotifyEvent]:
+        '''
+        waits up to timeout seconds, or forever with None, for events and
+        returns every event that is queued. Returns an empty list on timeout.
+        '''
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append(InotifyEvent(wd, mask, cookie, os.fsdecode(name)))
+
+        return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> 'Inotify':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
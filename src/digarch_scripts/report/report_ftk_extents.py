@@ -1,16 +1,48 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
+import hashlib
 import json
 import re
 import argparse
 import os
 import pathlib
 import logging
+import mmap
+import sys
+from typing import Union
+
+from ..batch import run_batch, write_batch_summary
+from ..file_warnings import DEFAULT_SAMPLE_SIZE, ZERO_BYTE, FileWarnings
+from .report_json import insert_report_item, write_json_atomic, write_report_json
 
 LOGGER = logging.getLogger(__name__)
 
+# Per file warnings, see FileWarnings
+ER_FILE_MESSAGES = {
+    ZERO_BYTE: '{group} contains the following 0-byte file: {path}. Review this file with the processing archivist.'
+}
+
 # Namespace for the FTK output XML
 FO_NAMESPACE = {'fo': 'http://www.w3.org/1999/XSL/Format'}
 
+# Byte count in a 'Logical Size' cell, e.g. '16 B'
+LOGICAL_SIZE = re.compile(r'(\d+)\sB')
+
+# Parse results are cached per report, bump when the cached data changes
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = pathlib.Path(
+    os.environ.get('XDG_CACHE_HOME', pathlib.Path.home() / '.cache')
+) / 'digarch_scripts' / 'report_ftk_extents'
+DEFAULT_CACHE_SIZE = 512
+
+# Start and end tags located by the section pre-scan
+PAGE_SEQUENCE_TAG = re.compile(rb'<(/?)fo:page-sequence(?=[\s/>])([^>]*)>')
+MASTER_REFERENCE = re.compile(rb'master-reference\s*=\s*["\']([^"\']*)["\']')
+ROOT_START_TAG = re.compile(rb'<fo:root\b[^>]*>')
+FLOW_START_TAG = re.compile(rb'<fo:flow\b[^>]*>')
+TABLE_START_TAG = re.compile(rb'<fo:table[\s>]')
+
 
 def _make_parser():
 
@@ -33,6 +65,27 @@ def _make_parser():
 
         return path
 
+    def validate_batch_input(f) -> list[pathlib.Path]:
+        '''
+        Expand a directory into the FTK reports it contains
+        '''
+
+        path = pathlib.Path(f)
+
+        if not path.is_dir():
+            return [validate_file_input(f)]
+
+        reports = sorted(
+            child for child in path.iterdir()
+            if child.is_file() and child.suffix.lower() in ['.xml', '.fo']
+        )
+        if not reports:
+            raise argparse.ArgumentTypeError(
+                f'Directory does not contain .xml or .fo files: {f}'
+            )
+
+        return reports
+
     def validate_output_dir(f) -> pathlib.Path:
 
         path = pathlib.Path(f)
@@ -48,11 +101,19 @@ def _make_parser():
         description='Create a JSON report from XML'
     )
 
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+
+    inputs.add_argument(
         '-f', '--file',
         help="path to FTK XML report",
-        type=validate_file_input,
-        required=True
+        type=validate_file_input
+    )
+
+    inputs.add_argument(
+        '-b', '--batch',
+        help="FTK XML reports or directories of reports to process in parallel",
+        type=validate_batch_input,
+        nargs='+'
     )
 
     parser.add_argument(
@@ -62,6 +123,69 @@ def _make_parser():
         required=True
     )
 
+    parser.add_argument(
+        '--stream',
+        help="parse the report incrementally to limit memory use on large reports",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--compact',
+        help="only keep the file size, name and bookmark of each file in memory",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--batch-workers',
+        help="number of reports to process at once in batch mode, default is the number of CPUs",
+        type=int
+    )
+
+    parser.add_argument(
+        '--compact-json',
+        help="write the JSON report without whitespace",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--parse-workers',
+        help="parse the bookmarks of each report in this many processes",
+        type=int
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        help="always parse the report instead of reusing results from a previous run",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        help=f"directory for cached parse results, default {DEFAULT_CACHE_DIR}",
+        type=pathlib.Path,
+        default=DEFAULT_CACHE_DIR
+    )
+
+    parser.add_argument(
+        '--cache-size',
+        help=f"maximum size of the cache in MB, default {DEFAULT_CACHE_SIZE}",
+        type=int,
+        default=DEFAULT_CACHE_SIZE
+    )
+
+    parser.add_argument(
+        '--warning-sample',
+        help=f"log 0-byte files one by one up to this many per ER, and summarize the ER beyond that, default {DEFAULT_SAMPLE_SIZE}",
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE
+    )
+
+    parser.add_argument(
+        '--list-file-warnings',
+        help="write every 0-byte file to a file_warnings.tsv file next to each JSON report",
+        action='store_true'
+    )
+
     return parser.parse_args()
 
 
@@ -85,14 +209,28 @@ def create_er_list(
     The function returns the entire list.
     '''
 
-    tree = tree.xpath(
+    toc = tree.xpath(
         '/fo:root/fo:page-sequence[@master-reference="TOC"]/fo:flow',
         namespaces=FO_NAMESPACE
     )[0]
 
+    ers = _toc_to_er_list(toc)
+    audit_ers(ers)
+
+    return ers
+
+
+def _toc_to_er_list(
+    toc: etree.Element
+) -> list[list[list[str], str, str]]:
+
+    '''
+    walks the rows of the TOC fo:flow and records each ER with its hierarchy
+    '''
+
     ers = []
     hierarchy = []
-    for child in tree:
+    for child in toc:
         # skip rows with an indent < 24
         if not child.get("start-indent"):
             continue
@@ -120,8 +258,6 @@ def create_er_list(
                     [hierarchy.copy(), refid, hierarchy[-1]]
                 )
 
-    audit_ers(ers)
-
     return ers
 
 
@@ -162,9 +298,55 @@ def audit_ers(ers: list[list[list[str], str, str]]) -> None:
     return None
 
 
+class BookmarkColumns:
+
+    '''
+    compact, column oriented store of the bookmark table fields
+    the report needs. Sizes are kept in an array, bookmark ids are
+    stored once and referenced by code, and names are only kept
+    for 0-byte files since they are only used for warnings.
+    Rows without a byte count are never counted, so they are not stored.
+    '''
+
+    def __init__(self):
+        self.bookmark_ids = []
+        self.codes = array('I')
+        self.sizes = array('q')
+        self.zero_byte_names = {}
+        self._id_codes = {}
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def append(
+        self,
+        bookmark_id: str,
+        logical_size: str,
+        name: str
+    ) -> None:
+
+        bytes = LOGICAL_SIZE.search(logical_size or '')
+        if not bytes:
+            return None
+
+        code = self._id_codes.get(bookmark_id)
+        if code is None:
+            code = self._id_codes[bookmark_id] = len(self.bookmark_ids)
+            self.bookmark_ids.append(sys.intern(bookmark_id))
+
+        file_size = int(bytes[1])
+        if file_size == 0:
+            self.zero_byte_names[len(self.sizes)] = name
+        self.codes.append(code)
+        self.sizes.append(file_size)
+
+        return None
+
+
 def transform_bookmark_tables(
-    tree: etree.ElementTree
-) -> list[dict]:
+    tree: etree.ElementTree,
+    compact: bool = False
+) -> Union[list[dict], BookmarkColumns]:
 
     '''
     transforms each row in the 'bookmarksPage' table
@@ -172,6 +354,8 @@ def transform_bookmark_tables(
     that will be summarized later.
     the return is a list of lists where the first item is the id with
     the prefix bk and the second item is a string serialized from the XML.
+    With compact, only the size, name and bookmark id are kept
+    in a BookmarkColumns.
     '''
 
     extent_tree = tree.xpath(
@@ -179,27 +363,72 @@ def transform_bookmark_tables(
         namespaces=FO_NAMESPACE
     )
 
-    bookmark_contents = []
-    for row in extent_tree:
-        # row is an /fo:row in /fo:table[@id]
-        file_table = row.xpath(
-            './fo:table-body/fo:table-row/fo:table-cell/fo:block',
-            namespaces=FO_NAMESPACE
-        )
-        file_dict = {
-            file_table[i].text: file_table[i + 1].text
-            for i in range(0, len(file_table), 2)
-        }
-        file_dict['file_id'] = row.get('id')
-        file_dict['bookmark_id'] = row.get('id').split('_')[0]
-        bookmark_contents.append(file_dict)
+    if compact:
+        bookmark_contents = BookmarkColumns()
+        for row in extent_tree:
+            _add_bookmark_table_to_columns(row, bookmark_contents)
+    else:
+        bookmark_contents = []
+        for row in extent_tree:
+            bookmark_contents.append(_bookmark_table_to_dict(row))
 
     return bookmark_contents
 
 
+def _bookmark_table_to_dict(
+    row: etree.Element
+) -> dict:
+
+    '''
+    converts a single /fo:table[@id] into a dict of its label and value cells
+    '''
+
+    # row is an /fo:row in /fo:table[@id]
+    file_table = row.xpath(
+        './fo:table-body/fo:table-row/fo:table-cell/fo:block',
+        namespaces=FO_NAMESPACE
+    )
+    file_dict = {
+        file_table[i].text: file_table[i + 1].text
+        for i in range(0, len(file_table), 2)
+    }
+    file_dict['file_id'] = row.get('id')
+    file_dict['bookmark_id'] = row.get('id').split('_')[0]
+
+    return file_dict
+
+
+def _add_bookmark_table_to_columns(
+    row: etree.Element,
+    columns: BookmarkColumns
+) -> None:
+
+    '''
+    projects the 'Logical Size' and 'Name' cells of a single
+    /fo:table[@id] into a BookmarkColumns
+    '''
+
+    file_table = row.xpath(
+        './fo:table-body/fo:table-row/fo:table-cell/fo:block',
+        namespaces=FO_NAMESPACE
+    )
+    logical_size = None
+    name = None
+    for i in range(0, len(file_table), 2):
+        label = file_table[i].text
+        if label == 'Logical Size':
+            logical_size = file_table[i + 1].text
+        elif label == 'Name':
+            name = file_table[i + 1].text
+
+    columns.append(row.get('id').split('_')[0], logical_size, name)
+
+    return None
+
+
 def add_extents_to_ers(
     er_list: list[list[list[str], str, str]],
-    bookmark_tables: list[dict]
+    bookmark_tables: Union[list[dict], BookmarkColumns]
 ) -> list[list[str, int, int]]:
 
     '''
@@ -208,12 +437,30 @@ def add_extents_to_ers(
     Returns list of lists with hierarchal ER string, file size, and file count.
     '''
 
+    return summarize_er_extents(
+        er_list, index_bookmark_tables(bookmark_tables)
+    )
+
+
+def summarize_er_extents(
+    er_list: list[list[list[str], str, str]],
+    bookmark_index: dict[str, list[int, int, list[str]]],
+    file_warnings: Union[FileWarnings, None] = None
+) -> list[list[str, int, int]]:
+
+    '''
+    summarizes the extent for each ER from the summary
+    built by index_bookmark_tables.
+    Returns list of lists with hierarchal ER string, file size, and file count.
+    '''
+
+    file_warnings = file_warnings or FileWarnings(LOGGER, ER_FILE_MESSAGES)
     ers_with_extents = []
 
     for er in er_list:
         bookmark_id = er[1]
         er_name = er[-1]
-        size, count = get_er_report(bookmark_tables, bookmark_id, er_name)
+        size, count = get_er_report(bookmark_index, bookmark_id, er_name, file_warnings)
 
         if count == 0:
             LOGGER.warning(
@@ -229,39 +476,77 @@ def add_extents_to_ers(
     return ers_with_extents
 
 
+def index_bookmark_tables(
+    bookmark_tables: Union[list[dict], BookmarkColumns]
+) -> dict[str, list[int, int, list[str]]]:
+
+    '''
+    summarizes every bookmark table row in one pass.
+    Returns a dict keyed by bookmark id (bf prefix) with the total file size,
+    the file count and the names of 0-byte files in report order.
+    '''
+
+    if isinstance(bookmark_tables, BookmarkColumns):
+        return _index_bookmark_columns(bookmark_tables)
+
+    bookmark_index = {}
+    for entry in bookmark_tables:
+        bytes = LOGICAL_SIZE.search(entry.get('Logical Size') or '')
+        if not bytes:
+            continue
+
+        totals = bookmark_index.get(entry['bookmark_id'])
+        if totals is None:
+            totals = bookmark_index[entry['bookmark_id']] = [0, 0, []]
+
+        file_size = int(bytes[1])
+        totals[0] += file_size
+        totals[1] += 1
+        if file_size == 0:
+            #extract file name, might have to parse file table better
+            totals[2].append(entry['Name'])
+
+    return bookmark_index
+
+
+def _index_bookmark_columns(
+    columns: BookmarkColumns
+) -> dict[str, list[int, int, list[str]]]:
+
+    totals = [[0, 0, []] for bookmark_id in columns.bookmark_ids]
+    for code, file_size in zip(columns.codes, columns.sizes):
+        bookmark_totals = totals[code]
+        bookmark_totals[0] += file_size
+        bookmark_totals[1] += 1
+
+    # zero_byte_names is filled in row order
+    for i, name in columns.zero_byte_names.items():
+        totals[columns.codes[i]][2].append(name)
+
+    return dict(zip(columns.bookmark_ids, totals))
+
+
 def get_er_report(
-    er_files: list[dict],
+    bookmark_index: dict[str, list[int, int, list[str]]],
     bookmark_id: str,
-    er_name: str
+    er_name: str,
+    file_warnings: Union[FileWarnings, None] = None
 ) -> tuple[int, int]:
 
     '''
     extract the total file size and file count for a given bookmark ID
+    from the summary built by index_bookmark_tables.
+    0-byte files are logged through file_warnings.
     Returns a tuple with the file size and file count.
     '''
 
-    size = 0
-    count = 0
-
     prefix = bookmark_id.replace('k', 'f')
-    for entry in er_files:
-        if entry['bookmark_id'] == prefix:
-
-            byte_string = entry['Logical Size']
-            bytes = re.findall(r'(\d+)\sB', byte_string)
-
-            if bytes:
-                count += 1
-                file_size = int(bytes[0])
-                if file_size == 0:
-                    file_name = entry['Name']
-                    #extract file name, might have to parse file table better
-                    LOGGER.warning(
-                        f'{er_name} contains the following 0-byte file: {file_name}. Review this file with the processing archivist.')
-                size += file_size
+    size, count, zero_byte_files = bookmark_index.get(prefix, (0, 0, []))
 
-            else:
-                pass
+    file_warnings = file_warnings or FileWarnings(LOGGER, ER_FILE_MESSAGES)
+    for file_name in zero_byte_files:
+        file_warnings.add(er_name, ZERO_BYTE, file_name)
+    file_warnings.log_group(er_name)
 
     return size, count
 
@@ -272,34 +557,41 @@ def create_report(
 ) -> dict:
 
     '''
-    recursive function to insert a given bookmark into a nested dictionary
+    inserts a given bookmark into a nested dictionary
+    based on the hierarchy of component titles.
+    Use build_report to insert many bookmarks.
+    Returns a nested dictionary
+    '''
+
+    return build_report([input], report)
+
+
+def build_report(
+    ers_with_extents: list[list[list[str], int, int]],
+    report: dict
+) -> dict:
+
+    '''
+    inserts every bookmark into a nested dictionary
     based on the hierarchy of component titles.
     Returns a nested dictionary
     '''
 
-    if len(input[0]) == 1:
-        number, name = input[0][0].split(':', maxsplit=1)
-        report['children'].append({
-            'title': input[0][0],
+    indexes = {}
+    for hierarchy, size, count in ers_with_extents:
+        number, name = hierarchy[-1].split(':', maxsplit=1)
+        er = {
+            'title': hierarchy[-1],
             'er_number': number,
             'er_name': name.strip(),
-            'file_size': input[1],
-            'file_count': input[2]
-        })
-    else:
-        parent, child = input[0][0], input[0][1:]
-        input[0] = child
-        for item in report['children']:
-            if item['title'] == parent:
-                item = create_report(input, item)
-                return report
-
-        report['children'].append(
-            create_report(input, {'title': parent, 'children': []})
-        )
+            'file_size': size,
+            'file_count': count
+        }
+        insert_report_item(report, hierarchy[:-1], er, indexes)
 
     return report
 
+
 def extract_collection_title(
     tree: etree.ElementTree
     ) -> str:
@@ -310,49 +602,620 @@ def extract_collection_title(
         namespaces=FO_NAMESPACE
     )
 
+    return _case_info_to_title(case_info)
+
+
+def _case_info_to_title(
+    case_info: list[str]
+) -> str:
+
     for i, txt in enumerate(case_info):
         if txt == "Case Name":
             collname = case_info[i+1]
 
     return collname
 
+
+def iterparse_report(
+    path: pathlib.Path,
+    compact: bool = False
+) -> tuple[
+    list[list[list[str], str, str]], Union[list[dict], BookmarkColumns], str
+]:
+
+    '''
+    streaming alternative to parse_xml, create_er_list,
+    transform_bookmark_tables and extract_collection_title.
+    fo:page-sequence sections are handled as they are read and every
+    processed table is cleared, so peak memory follows the largest table
+    rather than the size of the report.
+    Returns a tuple with the ER list, the bookmark tables and the collection title.
+    With compact, the bookmark tables are a BookmarkColumns.
+    '''
+
+    page_sequence = f'{{{FO_NAMESPACE["fo"]}}}page-sequence'
+    table = f'{{{FO_NAMESPACE["fo"]}}}table'
+    flow = f'{{{FO_NAMESPACE["fo"]}}}flow'
+
+    ers = None
+    bookmark_contents = BookmarkColumns() if compact else []
+    case_info = []
+    section = None
+
+    context = etree.iterparse(
+        str(path), events=('start', 'end'), tag=(page_sequence, table)
+    )
+    try:
+        for event, elem in context:
+            if elem.tag == page_sequence:
+                if event == 'start':
+                    section = elem.get('master-reference')
+                    continue
+
+                if section == 'TOC' and ers is None:
+                    toc = elem.find('fo:flow', namespaces=FO_NAMESPACE)
+                    ers = _toc_to_er_list(toc)
+                section = None
+                _release(elem)
+                continue
+
+            # only top level tables in a flow are complete records
+            if event == 'start' or elem.getparent().tag != flow:
+                continue
+
+            if section == 'bookmarksPage':
+                if elem.get('id') and compact:
+                    _add_bookmark_table_to_columns(elem, bookmark_contents)
+                elif elem.get('id'):
+                    bookmark_contents.append(_bookmark_table_to_dict(elem))
+                _release(elem)
+            elif section == 'caseInfoPage':
+                case_info.extend(elem.xpath(
+                    './fo:table-body/fo:table-row/fo:table-cell/fo:block/text()',
+                    namespaces=FO_NAMESPACE
+                ))
+                _release(elem)
+            elif section != 'TOC':
+                _release(elem)
+    except etree.XMLSyntaxError as e:
+        raise SystemExit(f"FTK report cannot be parsed. Edit the unreadable characters in the report with a text editor. {e.msg}")
+    finally:
+        del context
+
+    if ers is None:
+        raise ValueError(f'{path} does not contain a TOC section')
+
+    audit_ers(ers)
+
+    return ers, bookmark_contents, _case_info_to_title(case_info)
+
+
+def _release(
+    elem: etree.Element
+) -> None:
+
+    '''
+    clears a processed element and drops the siblings already read before it
+    '''
+
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+    return None
+
+
+def index_sections(
+    path: pathlib.Path
+) -> dict[str, list[tuple[int, int]]]:
+
+    '''
+    pre-scans a report for the byte offsets of each fo:page-sequence
+    without parsing it. The index can be passed to parse_section or
+    used by any other tool that reads the same report.
+    Returns a dict keyed by master-reference with a list of
+    (start, end) offsets, end being just past the closing tag.
+    '''
+
+    sections = {}
+    if os.path.getsize(path) == 0:
+        return sections
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = None
+        name = None
+        for tag in PAGE_SEQUENCE_TAG.finditer(mm):
+            if not tag[1]:
+                reference = MASTER_REFERENCE.search(tag[2])
+                name = reference[1].decode() if reference else ''
+                start = tag.start()
+                if tag[2].endswith(b'/'):
+                    sections.setdefault(name, []).append((start, tag.end()))
+                    start = None
+            elif start is not None:
+                sections.setdefault(name, []).append((start, tag.end()))
+                start = None
+
+    return sections
+
+
+def parse_section(
+    path: pathlib.Path,
+    sections: dict[str, list[tuple[int, int]]],
+    master_reference: str
+) -> etree.ElementTree:
+
+    '''
+    parses only the fo:page-sequence sections with the given master-reference.
+    The sections are wrapped in the report's own fo:root so the
+    result can be queried like a fully parsed report, e.g. with
+    extract_collection_title.
+    Returns an etree object.
+    '''
+
+    if master_reference not in sections:
+        raise ValueError(f'{path} does not contain a {master_reference} section')
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        first_start = sections[master_reference][0][0]
+        root = ROOT_START_TAG.search(mm, 0, first_start)
+        if not root:
+            raise ValueError(f'{path} does not have an fo:root before its sections')
+
+        # keeps the XML declaration and namespace declarations of the report
+        parts = [mm[:root.end()]]
+        for start, end in sections[master_reference]:
+            parts.append(mm[start:end])
+        parts.append(b'</fo:root>')
+
+    try:
+        root = etree.fromstring(b''.join(parts))
+    except etree.XMLSyntaxError as e:
+        raise SystemExit(f"FTK report cannot be parsed. Edit the unreadable characters in the report with a text editor. {e.msg}")
+
+    return etree.ElementTree(root)
+
+
+def read_collection_title(
+    path: pathlib.Path,
+    sections: Union[dict[str, list[tuple[int, int]]], None] = None
+) -> str:
+
+    '''
+    reads the collection title from the caseInfoPage section alone
+    '''
+
+    if sections is None:
+        sections = index_sections(path)
+
+    return extract_collection_title(
+        parse_section(path, sections, 'caseInfoPage')
+    )
+
+
+def split_bookmark_sections(
+    path: pathlib.Path,
+    sections: dict[str, list[tuple[int, int]]],
+    chunks: int
+) -> list[tuple[bytes, int, int, bytes]]:
+
+    '''
+    splits the flow of each bookmarksPage section into about the given
+    number of chunks, always cutting just before an fo:table.
+    Bookmark tables are not nested, so every chunk holds whole tables.
+    Returns a list of (header, start, end, footer) where start and end
+    are byte offsets into the report and header and footer are the tags
+    that make the chunk a parseable report.
+    '''
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        root = ROOT_START_TAG.search(mm)
+        if not root:
+            raise ValueError(f'{path} does not have an fo:root before its sections')
+
+        spans = []
+        for section_start, section_end in sections.get('bookmarksPage', []):
+            flow = FLOW_START_TAG.search(mm, section_start, section_end)
+            flow_end = mm.rfind(b'</fo:flow>', section_start, section_end)
+            if not flow or flow_end == -1:
+                continue
+            header = mm[:root.end()] + mm[section_start:flow.end()]
+            footer = mm[flow_end:section_end] + b'</fo:root>'
+
+            step = max((flow_end - flow.end()) // chunks, 1)
+            start = flow.end()
+            while start < flow_end:
+                table = TABLE_START_TAG.search(mm, start + step, flow_end)
+                end = table.start() if table else flow_end
+                spans.append((header, start, end, footer))
+                start = end
+
+    return spans
+
+
+def _index_bookmark_chunk(
+    path: pathlib.Path,
+    header: bytes,
+    start: int,
+    end: int,
+    footer: bytes,
+    compact: bool
+) -> dict[str, list[int, int, list[str]]]:
+
+    '''
+    worker for index_bookmarks_parallel, summarizes one chunk of tables
+    '''
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = header + mm[start:end] + footer
+
+    try:
+        tree = etree.ElementTree(etree.fromstring(data))
+    except etree.XMLSyntaxError as e:
+        raise SystemExit(f"FTK report cannot be parsed. Edit the unreadable characters in the report with a text editor. {e.msg}")
+
+    return index_bookmark_tables(transform_bookmark_tables(tree, compact))
+
+
+def index_bookmarks_parallel(
+    path: pathlib.Path,
+    sections: dict[str, list[tuple[int, int]]],
+    workers: Union[int, None] = None,
+    compact: bool = True
+) -> dict[str, list[int, int, list[str]]]:
+
+    '''
+    summarizes the bookmark tables by parsing chunks of the
+    bookmarksPage section in a pool of worker processes.
+    Chunk summaries are merged in report order, so the result is
+    the same as index_bookmark_tables on the whole report.
+    '''
+
+    workers = workers or os.cpu_count() or 1
+    # more chunks than workers evens out chunks of uneven density
+    spans = split_bookmark_sections(path, sections, workers * 4)
+
+    bookmark_index = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_index_bookmark_chunk, path, *span, compact)
+            for span in spans
+        ]
+
+        for future in futures:
+            chunk_index = future.result()
+            for bookmark_id, (size, count, zero_byte_files) in chunk_index.items():
+                totals = bookmark_index.get(bookmark_id)
+                if totals is None:
+                    bookmark_index[bookmark_id] = [size, count, zero_byte_files]
+                    continue
+                totals[0] += size
+                totals[1] += count
+                totals[2].extend(zero_byte_files)
+
+    return bookmark_index
+
+
+def read_report(
+    path: pathlib.Path,
+    stream: bool = False,
+    compact: bool = False,
+    parse_workers: Union[int, None] = None
+) -> tuple[
+    list[list[list[str], str, str]], dict[str, list[int, int, list[str]]], str
+]:
+
+    '''
+    parses an FTK report and summarizes its bookmark tables.
+    With parse_workers, only the TOC and caseInfoPage sections are
+    parsed here and the bookmarks are parsed in parallel.
+    Returns a tuple with the ER list, the bookmark summary
+    and the collection title.
+    '''
+
+    if parse_workers:
+        sections = index_sections(path)
+        # without a TOC there is nothing to split up, so the report is
+        # parsed whole below and a broken report gets its XML error
+        if 'TOC' in sections:
+            ers = create_er_list(parse_section(path, sections, 'TOC'))
+            colltitle = read_collection_title(path, sections)
+            bookmark_index = index_bookmarks_parallel(
+                path, sections, parse_workers, compact
+            )
+            return ers, bookmark_index, colltitle
+
+    if stream:
+        ers, bookmark_tables, colltitle = iterparse_report(path, compact)
+    else:
+        tree = parse_xml(path)
+        ers = create_er_list(tree)
+        bookmark_tables = transform_bookmark_tables(tree, compact)
+        colltitle = extract_collection_title(tree)
+
+    return ers, index_bookmark_tables(bookmark_tables), colltitle
+
+
+def report_cache_key(
+    path: pathlib.Path
+) -> str:
+
+    '''
+    identifies a report by the hash of its contents, its size and mtime
+    '''
+
+    stat = path.stat()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    return f'{digest.hexdigest()}_{stat.st_size}_{stat.st_mtime_ns}'
+
+
+def load_cached_report(
+    cache_dir: pathlib.Path,
+    key: str
+) -> Union[tuple[
+    list[list[list[str], str, str]], dict[str, list[int, int, list[str]]], str
+], None]:
+
+    '''
+    returns the parse results saved for a report key, or None if
+    the report has not been cached. A hit marks the entry as recently used.
+    '''
+
+    cache_file = cache_dir / f'{key}.json'
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOGGER.warning(f'Ignoring unreadable cache entry {cache_file}: {e}')
+        return None
+
+    if cached.get('version') != CACHE_VERSION:
+        return None
+
+    os.utime(cache_file)
+
+    return cached['ers'], cached['bookmark_index'], cached['title']
+
+
+def save_cached_report(
+    cache_dir: pathlib.Path,
+    key: str,
+    ers: list[list[list[str], str, str]],
+    bookmark_index: dict[str, list[int, int, list[str]]],
+    colltitle: str,
+    max_size: int = DEFAULT_CACHE_SIZE
+) -> None:
+
+    '''
+    saves the parse results for a report key and evicts the least
+    recently used entries once the cache is larger than max_size MB
+    '''
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_json_atomic({
+        'version': CACHE_VERSION,
+        'title': colltitle,
+        'ers': ers,
+        'bookmark_index': bookmark_index
+    }, cache_dir / f'{key}.json')
+
+    evict_cache(cache_dir, max_size * 1024 * 1024)
+
+    return None
+
+
+def evict_cache(
+    cache_dir: pathlib.Path,
+    max_bytes: int
+) -> None:
+
+    '''
+    deletes the least recently used cache entries until
+    the cache holds no more than max_bytes
+    '''
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            # removed by another run sharing the cache
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    return None
+
+
+def report_file_name(collname: str) -> str:
+
+    '''
+    the name shared by the json file and any sidecar of a collection
+    '''
+
+    return collname.replace(" ", "_")
+
+
 def make_json(
     destination: pathlib.Path,
     report: dict,
-    collname
-) -> None:
+    collname,
+    compact: bool = False
+) -> pathlib.Path:
 
     '''
     creates a json file with the name of the collection as the file name
     destination is the file path from args parse and report
     is the collection style dict
+    Returns the path of the json file.
     '''
 
-    name = collname
-    name = name.replace(" ", "_")
+    json_path = pathlib.Path(destination) / f'{report_file_name(collname)}.json'
 
-    with open(os.path.join(destination, f'{name}.json'), 'w') as file:
-        json.dump(report, file)
+    write_report_json(report, json_path, compact)
 
+    return json_path
 
-def main() -> None:
-    args = _make_parser()
 
-    print('Parsing XML ...')
-    tree = parse_xml(args.file)
+def process_report(
+    path: pathlib.Path,
+    destination: pathlib.Path,
+    stream: bool = False,
+    compact: bool = False,
+    cache_dir: Union[pathlib.Path, None] = None,
+    cache_size: int = DEFAULT_CACHE_SIZE,
+    parse_workers: Union[int, None] = None,
+    compact_json: bool = False,
+    progress: bool = False,
+    warning_sample: int = DEFAULT_SAMPLE_SIZE,
+    list_file_warnings: bool = False
+) -> pathlib.Path:
+
+    '''
+    runs every step from FTK report to JSON report for a single file.
+    Parse results are cached in cache_dir unless it is None.
+    With list_file_warnings, every 0-byte file is listed in a
+    file_warnings.tsv file next to the json file.
+    Returns the path of the json file.
+    '''
+
+    cached = None
+    if cache_dir:
+        cache_key = report_cache_key(path)
+        cached = load_cached_report(cache_dir, cache_key)
+
+    if cached:
+        if progress:
+            print('Using cached parse of XML ...')
+        ers, bookmark_index, colltitle = cached
+        audit_ers(ers)
+    else:
+        if progress:
+            print('Parsing XML ...')
+        ers, bookmark_index, colltitle = read_report(
+            path, stream, compact, parse_workers
+        )
+        if cache_dir:
+            save_cached_report(
+                cache_dir, cache_key, ers, bookmark_index, colltitle, cache_size
+            )
+
+    if progress:
+        print('Creating report ...')
+    sidecar = None
+    if list_file_warnings:
+        sidecar = pathlib.Path(destination) / f'{report_file_name(colltitle)}_file_warnings.tsv'
+    with FileWarnings(LOGGER, ER_FILE_MESSAGES, warning_sample, sidecar) as file_warnings:
+        ers_with_extents = summarize_er_extents(ers, bookmark_index, file_warnings)
+    dct = build_report(ers_with_extents, {'title': colltitle, 'children': []})
+
+    if progress:
+        print("Writing report ...")
+    return make_json(destination, dct, colltitle, compact_json)
+
+
+def _process_batch_item(
+    path: pathlib.Path,
+    destination: pathlib.Path,
+    options: dict
+) -> tuple[Union[pathlib.Path, None], Union[str, None]]:
+
+    '''worker for process_batch, returns the path of the json report.'''
+
+    try:
+        return process_report(path, destination, **options), None
+    except etree.XMLSyntaxError as e:
+        return None, f'XMLSyntaxError: {e.msg}'
+    except SystemExit as e:
+        # parse_xml exits with an explanation for unreadable reports
+        return None, str(e)
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def process_batch(
+    paths: list[pathlib.Path],
+    destination: pathlib.Path,
+    batch_workers: Union[int, None] = None,
+    **options
+) -> tuple[dict[pathlib.Path, pathlib.Path], dict[pathlib.Path, str]]:
+
+    '''
+    creates a JSON report for each FTK report using a pool of worker
+    processes, starting with the largest reports.
+    options are passed on to process_report.
+    Returns a tuple of dicts mapping each report to its json file
+    or to the reason it failed.
+    '''
+
+    paths = sorted(set(paths), key=lambda p: p.stat().st_size, reverse=True)
 
-    print('Creating report ...')
-    ers = create_er_list(tree)
+    succeeded = {}
+    failed = {}
+    batch = run_batch(
+        ProcessPoolExecutor(max_workers=batch_workers),
+        _process_batch_item, paths, destination, options
+    )
+    for path, json_path, error in batch:
+        if error:
+            LOGGER.error(f'{path} could not be processed. {error}')
+            failed[path] = error
+            continue
 
-    bookmark_tables = transform_bookmark_tables(tree)
-    ers_with_extents = add_extents_to_ers(ers, bookmark_tables)
-    colltitle = extract_collection_title(tree)
-    dct = {'title': colltitle, 'children': []}
-    for er in ers_with_extents:
-        dct = create_report(er, dct)
+        if json_path in succeeded.values():
+            LOGGER.warning(
+                f'{path} has the same collection title as another report in the batch. {json_path} was overwritten.'
+            )
+        succeeded[path] = json_path
+
+    return succeeded, failed
+
+
+def main() -> None:
+    args = _make_parser()
+
+    options = {
+        'stream': args.stream,
+        'compact': args.compact,
+        'cache_dir': None if args.no_cache else args.cache_dir,
+        'cache_size': args.cache_size,
+        'parse_workers': args.parse_workers,
+        'compact_json': args.compact_json,
+        'warning_sample': args.warning_sample,
+        'list_file_warnings': args.list_file_warnings
+    }
+
+    if args.file:
+        process_report(args.file, args.output, progress=True, **options)
+        return None
+
+    reports = [report for reports in args.batch for report in reports]
+    print(f'Creating reports for {len(reports)} FTK reports ...')
+    succeeded, failed = process_batch(
+        reports, args.output, args.batch_workers, **options
+    )
+    summary_path = write_batch_summary(args.output, succeeded, failed)
 
-    print("Writing report ...")
-    make_json(args.output, dct, colltitle)
+    print(f'{len(succeeded)} reports written, {len(failed)} failed. See {summary_path}')
+    for path, error in failed.items():
+        print(f'  {path}: {error}')
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,35 @@
 import argparse
-import os
+import asyncio
 import json
+import os
 import pathlib
 import logging
+import math
+import random
 import re
+import sqlite3
+import statistics
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from typing import AsyncIterator, Callable, Iterator, NamedTuple, Union
+
+from ..batch import run_batch, write_batch_summary
+from ..file_warnings import DEFAULT_SAMPLE_SIZE, SYMLINK, ZERO_BYTE, FileWarnings
+from .inotify import IN_IGNORED, IN_Q_OVERFLOW, Inotify
+from .report_json import insert_report_item, write_json_atomic, write_report_json
 
 LOGGER = logging.getLogger(__name__)
 
+# Seconds each collection took on its last batch run, kept in the output directory
+DURATIONS_FILE = 'hdd_extents_durations.json'
+
+ER_FILE_MESSAGES = {
+    ZERO_BYTE: '{group} contains the following 0-byte file: {path}. Review this file with the processing archivist.',
+    SYMLINK: '{group} contains the following symlink, which was not followed: {path}.'
+}
+
 def parse_args():
     parser = argparse.ArgumentParser()
 
@@ -36,11 +59,19 @@ def parse_args():
 
         return path
 
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+
+    inputs.add_argument(
         "-d", "--dir",
         type=validate_dir,
-        help="Path to the parent directory, e.g. M###_FAComponents",
-        required = True
+        help="Path to the parent directory, e.g. M###_FAComponents"
+    )
+
+    inputs.add_argument(
+        '-b', '--batch',
+        type=validate_dir,
+        nargs='+',
+        help="Paths to several parent directories, each reported separately"
     )
 
     parser.add_argument(
@@ -50,44 +81,763 @@ def parse_args():
         required=True
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        '--workers',
+        help="scan folders with this many threads, for network storage",
+        type=int
+    )
+
+    parser.add_argument(
+        '--batch-workers',
+        help="number of collections to scan at once in batch mode, default is the number of CPUs",
+        type=int
+    )
+
+    parser.add_argument(
+        '--inodes',
+        help="count hardlinked files once per ER, list symlinks instead of following them and report allocated size",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--histograms',
+        help="add a file size histogram and file counts by extension to each ER",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--cache',
+        help="keep folder totals in the output directory and only rescan changed folders on later runs",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--verify-cache',
+        help="rescan every folder and report folders whose totals differ from the cache",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--estimate',
+        help="estimate each ER's size and count from a sample of its folders instead of counting every file",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--samples',
+        help="number of random descents through each objects folder with --estimate",
+        type=int,
+        default=30
+    )
+
+    parser.add_argument(
+        '--warning-sample',
+        help="log 0-byte files and symlinks one by one up to this many per ER, and summarize the ER beyond that",
+        type=int,
+        default=DEFAULT_SAMPLE_SIZE
+    )
+
+    parser.add_argument(
+        '--list-file-warnings',
+        help="write every 0-byte file and symlink to a file_warnings.tsv file in the output directory",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--watch',
+        help="after the first report, keep watching --dir and rewrite the report as files change (Linux only)",
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--debounce',
+        help="with --watch, seconds without changes before the report is rewritten",
+        type=float,
+        default=2.0
+    )
+
+    parser.add_argument(
+        '--compact-json',
+        help="write the JSON report without whitespace",
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+    if args.watch and not args.dir:
+        parser.error('--watch needs a single collection in --dir')
+    if args.watch and args.list_file_warnings:
+        # rescanned ERs would be listed again on every update
+        parser.error('--list-file-warnings cannot be used with --watch')
+
+    return args
 
 
 def get_ers(
-    facomponent_dir: pathlib.Path
+    facomponent_dir: pathlib.Path,
+    workers: Union[int, None] = None,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False,
+    histograms: bool = False,
+    file_warnings: Union[FileWarnings, None] = None
 ) -> list[str, int, int, str]:
+    file_warnings = file_warnings or FileWarnings(LOGGER, ER_FILE_MESSAGES)
+    if workers:
+        scanned_ers = scan_ers_threaded(facomponent_dir, workers, cache, inodes)
+    else:
+        scanned_ers = scan_ers(facomponent_dir, cache, inodes)
+
     ers = []
-    for possible_er in facomponent_dir.glob('**/ER *'):
-        objects_dir = possible_er.joinpath('objects')
-        if possible_er.is_dir():
-            if objects_dir.is_dir():
-                er = possible_er.relative_to(facomponent_dir)
-                size = 0
-                count = 0
-                for path, dirs, files in os.walk(objects_dir):
-                    for f in files:
-                        count += 1
-                        fp = os.path.join(path, f)
-                        if os.path.getsize(fp) == 0 and not os.path.basename(fp).startswith('Icon'):
-                            LOGGER.warning(
-                            f'{possible_er.name} contains the following 0-byte file: {f}. Review this file with the processing archivist.')
-                        size += os.path.getsize(fp)
-            else:
-                LOGGER.warning(
-                    f'{possible_er.name} does not contain an object folder. It will be omitted from the report.')
+    for er_path, er, stats in scanned_ers:
+        item = _er_item(er_path, er, stats, inodes, histograms, file_warnings)
+        if item is not None:
+            ers.append(item)
+    return ers
+
+
+async def get_ers_async(
+    facomponent_dir: pathlib.Path,
+    concurrency: int = 16,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False,
+    histograms: bool = False,
+    file_warnings: Union[FileWarnings, None] = None
+) -> AsyncIterator[list[str, int, int, str]]:
+    """Yield the same ERs as get_ers, with the same warnings, as each ER is
+    finished. ERs come in the order they finish, not the order of the tree."""
+    file_warnings = file_warnings or FileWarnings(LOGGER, ER_FILE_MESSAGES)
+    async for er_path, er, stats in scan_ers_async(facomponent_dir, concurrency, cache, inodes):
+        item = _er_item(er_path, er, stats, inodes, histograms, file_warnings)
+        if item is not None:
+            yield item
+
+
+def _er_item(
+    er_path: str,
+    er: str,
+    stats: Union['ObjectsTotals', None],
+    inodes: bool = False,
+    histograms: bool = False,
+    file_warnings: Union[FileWarnings, None] = None
+) -> Union[list[str, int, int, str], None]:
+    """Log the warnings for one ER and return its report item,
+    or None if it is left out of the report. 0-byte files and symlinks
+    are summarized by file_warnings."""
+    er_name = os.path.basename(er_path)
+    if stats is None:
+        LOGGER.warning(
+            f'{er_name} does not contain an object folder. It will be omitted from the report.')
+        return None
+
+    size, count, zero_byte_files = stats.size, stats.count, stats.zero_byte_files
+    file_warnings = file_warnings or FileWarnings(LOGGER, ER_FILE_MESSAGES)
+    for f in zero_byte_files:
+        file_warnings.add(er_name, ZERO_BYTE, f)
+    for f in stats.symlinks:
+        file_warnings.add(er_name, SYMLINK, f)
+    file_warnings.log_group(er_name)
+    if count == 0:
+        LOGGER.warning(
+            f'{er_name} does not contain any files. It will be omitted from the report.')
+        return None
+    if size == 0:
+        LOGGER.warning(
+            f'{er_name} contains no files with bytes. This ER is omitted from report. Review this ER with the processing archivist.')
+        return None
+
+    fields = {}
+    if inodes:
+        fields['allocated_size'] = stats.allocated
+    if histograms:
+        fields['size_histogram'] = [
+            [_bucket_floor(bucket), stats.size_histogram[bucket]]
+            for bucket in sorted(stats.size_histogram)
+        ]
+        fields['extensions'] = {
+            extension: {'file_count': ext_count, 'file_size': ext_size}
+            for extension, (ext_count, ext_size) in sorted(
+                stats.extensions.items(), key=lambda item: (-item[1][0], item[0])
+            )
+        }
+    if fields:
+        return [er, size, count, er_name, fields]
+    return [er, size, count, er_name]
+
+
+def scan_ers(
+    facomponent_dir: pathlib.Path,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> Iterator[tuple[str, str, Union['ObjectsTotals', None]]]:
+    """Yield the path, relative path and objects folder totals of every ER.
+    Totals are None if the ER has no objects folder."""
+    for er_path, er in find_ers(facomponent_dir):
+        objects_dir = os.path.join(er_path, 'objects')
+        if not os.path.isdir(objects_dir):
+            yield er_path, er, None
+        else:
+            yield er_path, er, scan_objects(objects_dir, cache, inodes)
+
+
+def find_ers(
+    facomponent_dir: pathlib.Path
+) -> Iterator[tuple[str, str]]:
+    """Yield the path and relative path of every ER folder in a single scandir pass.
+    ERs come in the same order as facomponent_dir.glob('**/ER *'), but the
+    objects folder of an ER is not searched for more ERs."""
+    # each item is a directory path, its path relative to facomponent_dir
+    # and whether it is an ER folder
+    stack = [(str(facomponent_dir), '', False)]
+    while stack:
+        ers, subdirs = _scan_tree_dir(*stack.pop())
+        yield from ers
+        # reversed so the first subdirectory is searched first
+        stack.extend(reversed(subdirs))
+
+
+def scan_objects(
+    objects_dir: str,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> 'ObjectsTotals':
+    """Return the totals of the files in an objects folder, statting each
+    file once. Walks in the same order as os.walk."""
+    return _sum_objects_dirs(
+        objects_dir, lambda path: _scan_objects_dir(path, cache, inodes)
+    )
+
+
+def _sum_objects_dirs(
+    objects_dir: str,
+    get_dir: Callable[[str], 'DirTotals']
+) -> 'ObjectsTotals':
+    size = 0
+    count = 0
+    allocated = 0
+    zero_byte_files = []
+    symlinks = []
+    size_histogram = {}
+    extensions = {}
+    # ids of linked files and folders already counted in this objects folder
+    seen_files = set()
+    seen_dirs = set()
+    stack = [objects_dir]
+    while stack:
+        totals = get_dir(stack.pop())
+        if totals.dir_id is not None:
+            # a folder mounted twice is only counted once
+            if totals.dir_id in seen_dirs:
                 continue
-        if count == 0:
-            LOGGER.warning(
-                f'{possible_er.name} does not contain any files. It will be omitted from the report.')
+            seen_dirs.add(totals.dir_id)
+
+        size += totals.size
+        count += totals.count
+        allocated += totals.allocated
+        for bucket, bucket_count in totals.size_histogram.items():
+            size_histogram[bucket] = size_histogram.get(bucket, 0) + bucket_count
+        for extension, (ext_count, ext_size) in totals.extensions.items():
+            _add_extension(extensions, extension, ext_count, ext_size)
+        for file_id, file_size, file_allocated, extension in totals.linked:
+            if file_id not in seen_files:
+                seen_files.add(file_id)
+                size += file_size
+                count += 1
+                allocated += file_allocated
+                bucket = file_size.bit_length()
+                size_histogram[bucket] = size_histogram.get(bucket, 0) + 1
+                _add_extension(extensions, extension, 1, file_size)
+        zero_byte_files.extend(totals.zero_byte_files)
+        symlinks.extend(totals.symlinks)
+        # reversed so the first subdirectory is walked first
+        stack.extend(reversed(totals.subdirs))
+
+    return ObjectsTotals(
+        size, count, zero_byte_files, allocated, symlinks, size_histogram, extensions
+    )
+
+
+class ObjectsTotals(NamedTuple):
+    """Totals of the files in an ER's objects folder."""
+    size: int
+    count: int
+    zero_byte_files: list[str]
+    allocated: int
+    symlinks: list[str]
+    # number of files in each power of two size bucket, see _bucket_floor
+    size_histogram: dict[int, int]
+    # file count and size by lower case extension
+    extensions: dict[str, list[int]]
+
+
+class DirTotals(NamedTuple):
+    """Totals of the files directly inside one folder of an objects folder."""
+    size: int
+    count: int
+    zero_byte_files: list[str]
+    subdirs: list[str]
+    allocated: int
+    # files with more than one link as (id, size, allocated, extension), left
+    # out of the totals so each is only counted once per ER
+    linked: list[tuple[int, int, int, str]]
+    symlinks: list[str]
+    dir_id: Union[int, None]
+    size_histogram: dict[int, int]
+    extensions: dict[str, list[int]]
+
+
+# stands in for a folder that disappeared before it could be listed
+EMPTY_DIR = DirTotals(0, 0, [], [], 0, [], [], None, {}, {})
+
+
+# distinct extensions kept per ER, any others are counted under OTHER_EXTENSIONS
+MAX_EXTENSIONS = 100
+OTHER_EXTENSIONS = 'other'
+
+
+def _add_extension(
+    extensions: dict[str, list[int]],
+    extension: str,
+    count: int,
+    size: int
+) -> None:
+    if extension not in extensions and len(extensions) >= MAX_EXTENSIONS:
+        extension = OTHER_EXTENSIONS
+    totals = extensions.setdefault(extension, [0, 0])
+    totals[0] += count
+    totals[1] += size
+
+
+def _bucket_floor(bucket: int) -> int:
+    """The smallest file size in a histogram bucket. Bucket n holds sizes
+    from 2 ** (n - 1) up to 2 ** n - 1, and bucket 0 holds 0-byte files."""
+    return 1 << (bucket - 1) if bucket else 0
+
+
+def _file_id(stat: os.stat_result) -> int:
+    # (st_dev, st_ino) packed into a single int to keep the seen sets small
+    return stat.st_dev << 64 | stat.st_ino
+
+
+def _allocated_size(stat: os.stat_result) -> int:
+    # st_blocks is always in 512 byte units, and missing on Windows
+    blocks = getattr(stat, 'st_blocks', None)
+    return stat.st_size if blocks is None else blocks * 512
+
+
+def _scan_objects_dir(
+    path: str,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> DirTotals:
+    """Total the files directly inside one folder of an objects folder,
+    reusing the cached totals if the folder has not changed."""
+    if cache is None:
+        return _list_objects_dir(path, inodes)
+    return cache.scan(path)
+
+
+def _list_objects_dir(
+    path: str,
+    inodes: bool = False
+) -> DirTotals:
+    """With inodes, symlinks are listed rather than followed, files with
+    several links are set aside to be counted once, and the folder's id is
+    recorded so a folder mounted twice is only counted once."""
+    size = 0
+    count = 0
+    allocated = 0
+    zero_byte_files = []
+    subdirs = []
+    linked = []
+    symlinks = []
+    dir_id = None
+    size_histogram = {}
+    extensions = {}
+    try:
+        if inodes:
+            dir_id = _file_id(os.stat(path))
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return DirTotals(
+            size, count, zero_byte_files, subdirs, allocated, linked, symlinks, dir_id,
+            size_histogram, extensions
+        )
+
+    for entry in entries:
+        if inodes and entry.is_symlink():
+            symlinks.append(entry.name)
             continue
-        if size == 0:
-            LOGGER.warning(
-                f'{possible_er.name} contains no files with bytes. This ER is omitted from report. Review this ER with the processing archivist.')
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if not entry.is_symlink():
+                subdirs.append(entry.path)
+            continue
+
+        stat = entry.stat(follow_symlinks=not inodes)
+        if stat.st_size == 0 and not entry.name.startswith('Icon'):
+            zero_byte_files.append(entry.name)
+        extension = os.path.splitext(entry.name)[1].lower()
+        if inodes and stat.st_nlink > 1:
+            linked.append((_file_id(stat), stat.st_size, _allocated_size(stat), extension))
+            continue
+        count += 1
+        size += stat.st_size
+        allocated += _allocated_size(stat)
+        bucket = stat.st_size.bit_length()
+        size_histogram[bucket] = size_histogram.get(bucket, 0) + 1
+        _add_extension(extensions, extension, 1, stat.st_size)
+
+    return DirTotals(
+        size, count, zero_byte_files, subdirs, allocated, linked, symlinks, dir_id,
+        size_histogram, extensions
+    )
+
+
+def _scan_tree_dir(
+    path: str,
+    rel_path: str,
+    in_er: bool
+) -> tuple[list[tuple[str, str]], list[tuple[str, str, bool]]]:
+    """List one folder above the objects folders.
+    Returns the ERs it contains and the subdirectories to search."""
+    ers = []
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return ers, subdirs
+
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if not is_dir:
+            continue
+
+        rel_entry = os.path.join(rel_path, entry.name)
+        is_er = os.path.normcase(entry.name).startswith(os.path.normcase('ER '))
+        if is_er:
+            ers.append((entry.path, rel_entry))
+        if in_er and entry.name == 'objects':
             continue
+        if not entry.is_symlink():
+            subdirs.append((entry.path, rel_entry, is_er))
 
-        ers.append([str(er), size, count, possible_er.name])
+    return ers, subdirs
+
+
+def _scan_er_objects(
+    er_path: str,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> Union[DirTotals, None]:
+    objects_dir = os.path.join(er_path, 'objects')
+    if not os.path.isdir(objects_dir):
+        return None
+    return _scan_objects_dir(objects_dir, cache, inodes)
+
+
+class StatCache:
+    """Per folder totals of the objects folders from previous runs, kept in SQLite.
+    A folder whose mtime is unchanged is not listed again, though its
+    subfolders are still checked. Editing a file in place does not change
+    its folder's mtime, so verify rescans everything and records folders
+    whose totals drifted from the cache."""
+
+    VERSION = 3
+
+    def __init__(
+        self,
+        db_path: pathlib.Path,
+        root: pathlib.Path,
+        verify: bool = False,
+        inodes: bool = False
+    ) -> None:
+        self.root = str(root)
+        self.verify = verify
+        self.inodes = inodes
+        self.drift = []
+        self._scanned = {}
+        self._conn = sqlite3.connect(db_path)
+        # totals from an older layout or the other accounting mode are dropped
+        layout = self.VERSION * 2 + inodes
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != layout:
+            with self._conn:
+                self._conn.execute('DROP TABLE IF EXISTS dirs')
+                self._conn.execute(f'PRAGMA user_version = {layout}')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dirs ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, totals TEXT NOT NULL)'
+        )
+        # loaded up front so threads can share it without touching SQLite
+        self._cached = {
+            path: (mtime_ns, totals)
+            for path, mtime_ns, totals in self._conn.execute('SELECT * FROM dirs')
+        }
+
+    def scan(
+        self,
+        path: str
+    ) -> DirTotals:
+        rel_path = os.path.relpath(path, self.root)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return _list_objects_dir(path, self.inodes)
+
+        cached = self._cached.get(rel_path)
+        unchanged = cached is not None and cached[0] == mtime_ns
+        if unchanged and not self.verify:
+            self._scanned[rel_path] = cached
+            totals = self._decode(cached[1])
+            return totals._replace(
+                subdirs=[os.path.join(path, subdir) for subdir in totals.subdirs]
+            )
+
+        totals = _list_objects_dir(path, self.inodes)
+        # subfolders are stored by name so the cache survives moving the collection
+        entry = (mtime_ns, json.dumps(totals._replace(
+            subdirs=[os.path.basename(subdir) for subdir in totals.subdirs]
+        )))
+        if unchanged and cached != entry:
+            cached_totals = self._decode(cached[1])
+            self.drift.append((
+                rel_path,
+                (cached_totals.size, cached_totals.count),
+                (totals.size, totals.count)
+            ))
+        self._scanned[rel_path] = entry
+
+        return totals
+
+    @staticmethod
+    def _decode(totals: str) -> DirTotals:
+        totals = DirTotals(*json.loads(totals))
+        # JSON turns the histogram's int keys into strings
+        return totals._replace(size_histogram={
+            int(bucket): count for bucket, count in totals.size_histogram.items()
+        })
+
+    def save(self) -> None:
+        """Store this run's folders and forget folders that no longer exist."""
+        with self._conn:
+            self._conn.execute('DELETE FROM dirs')
+            self._conn.executemany(
+                'INSERT INTO dirs VALUES (?, ?, ?)',
+                ((path, mtime_ns, totals) for path, (mtime_ns, totals) in self._scanned.items())
+            )
+        self._conn.close()
+
+
+def scan_ers_threaded(
+    facomponent_dir: pathlib.Path,
+    workers: int,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> list[tuple[str, str, Union['ObjectsTotals', None]]]:
+    """Scan the tree with a pool of threads, for storage where each listing
+    or stat waits on the network. Every folder is a separate task taken by
+    the next free thread, and results are put back together in the same
+    order as scan_ers."""
+    tree_dirs = {}
+    objects_dirs = {}
+    er_objects = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        root = str(facomponent_dir)
+        pending = {
+            executor.submit(_scan_tree_dir, root, '', False): ('tree', root)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, path = pending.pop(future)
+                result = future.result()
+
+                if kind == 'tree':
+                    tree_dirs[path] = result
+                    ers, subdirs = result
+                    for er_path, er in ers:
+                        pending[executor.submit(_scan_er_objects, er_path, cache, inodes)] = ('er', er_path)
+                    for subdir in subdirs:
+                        pending[executor.submit(_scan_tree_dir, *subdir)] = ('tree', subdir[0])
+                    continue
+
+                if kind == 'er':
+                    er_objects[path] = result is not None
+                    path = os.path.join(path, 'objects')
+                if result is not None:
+                    objects_dirs[path] = result
+                    for subdir in result.subdirs:
+                        pending[executor.submit(_scan_objects_dir, subdir, cache, inodes)] = ('objects', subdir)
+
+    scanned_ers = []
+    stack = [str(facomponent_dir)]
+    while stack:
+        ers, subdirs = tree_dirs[stack.pop()]
+        for er_path, er in ers:
+            stats = None
+            if er_objects[er_path]:
+                stats = _sum_objects_dirs(os.path.join(er_path, 'objects'), objects_dirs.__getitem__)
+            scanned_ers.append((er_path, er, stats))
+        stack.extend(reversed([subdir[0] for subdir in subdirs]))
+
+    return scanned_ers
+
+
+async def scan_ers_async(
+    facomponent_dir: pathlib.Path,
+    concurrency: int = 16,
+    cache: Union['StatCache', None] = None,
+    inodes: bool = False
+) -> AsyncIterator[tuple[str, str, Union['ObjectsTotals', None]]]:
+    """Scan the tree without blocking the event loop. Each listing runs in
+    a thread through asyncio.to_thread, with at most concurrency running at
+    once, and every ER is yielded as soon as its objects folder is totalled,
+    so ERs come in the order they finish rather than the order of scan_ers."""
+    semaphore = asyncio.Semaphore(concurrency)
+    finished = asyncio.Queue()
+    er_tasks = []
+
+    async def run(func, *args):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def walk_tree(path, rel_path, in_er):
+        ers, subdirs = await run(_scan_tree_dir, path, rel_path, in_er)
+        for er_path, er in ers:
+            er_tasks.append(asyncio.create_task(scan_er(er_path, er)))
+        await asyncio.gather(*(walk_tree(*subdir) for subdir in subdirs))
+
+    async def scan_er(er_path, er):
+        objects_dirs = {}
+
+        async def walk_objects(path):
+            totals = objects_dirs[path] = await run(_scan_objects_dir, path, cache, inodes)
+            await asyncio.gather(*(walk_objects(subdir) for subdir in totals.subdirs))
+
+        stats = None
+        first_dir = await run(_scan_er_objects, er_path, cache, inodes)
+        if first_dir is not None:
+            objects_dir = os.path.join(er_path, 'objects')
+            objects_dirs[objects_dir] = first_dir
+            await asyncio.gather(*(walk_objects(subdir) for subdir in first_dir.subdirs))
+            stats = _sum_objects_dirs(objects_dir, objects_dirs.__getitem__)
+        await finished.put((er_path, er, stats))
+
+    async def scan_all():
+        try:
+            await walk_tree(str(facomponent_dir), '', False)
+            await asyncio.gather(*er_tasks)
+        finally:
+            await finished.put(None)
+
+    scanning = asyncio.create_task(scan_all())
+    try:
+        while True:
+            result = await finished.get()
+            if result is None:
+                break
+            yield result
+        # raises anything that went wrong while scanning
+        await scanning
+    finally:
+        for task in [scanning, *er_tasks]:
+            task.cancel()
+
+
+def estimate_ers(
+    facomponent_dir: pathlib.Path,
+    samples: int = 30,
+    seed: Union[int, None] = None
+) -> list[str, int, int, str, dict]:
+    """Like get_ers, but the size and count of each ER are estimated from
+    a sample of its objects folder. Each ER also gets the 95% confidence
+    intervals of both estimates. 0-byte files are not reported, since most
+    folders are never listed."""
+    rng = random.Random(seed)
+    ers = []
+    for er_path, er in find_ers(facomponent_dir):
+        objects_dir = os.path.join(er_path, 'objects')
+        if not os.path.isdir(objects_dir):
+            _er_item(er_path, er, None, False)
+            continue
+
+        size, count, size_interval, count_interval = estimate_objects(objects_dir, samples, rng)
+        item = _er_item(er_path, er, ObjectsTotals(size, count, [], 0, [], {}, {}))
+        if item is not None:
+            item.append({
+                'file_size_interval': size_interval,
+                'file_count_interval': count_interval
+            })
+            ers.append(item)
     return ers
 
+
+def estimate_objects(
+    objects_dir: str,
+    samples: int = 30,
+    rng: Union[random.Random, None] = None
+) -> tuple[int, int, list[int], list[int]]:
+    """Estimate the total size and count of files in an objects folder with
+    Knuth's random descent: each sample walks from the objects folder down
+    through randomly chosen subfolders, weighting every folder's totals by
+    the number of folders it stands in for. Returns the estimated size and
+    count and their 95% confidence intervals. Folders are only listed once,
+    so if the samples cover the whole folder the totals are exact."""
+    rng = rng or random.Random()
+    listed = {}
+    size_samples = []
+    count_samples = []
+    for _ in range(samples):
+        path = objects_dir
+        weight = 1
+        size = 0
+        count = 0
+        while True:
+            totals = listed.get(path)
+            if totals is None:
+                totals = listed[path] = _list_objects_dir(path)
+            size += weight * totals.size
+            count += weight * totals.count
+            if not totals.subdirs:
+                break
+            weight *= len(totals.subdirs)
+            path = rng.choice(totals.subdirs)
+        size_samples.append(size)
+        count_samples.append(count)
+
+    # what was listed is a lower bound, and the answer if nothing was missed
+    listed_size = sum(totals.size for totals in listed.values())
+    listed_count = sum(totals.count for totals in listed.values())
+    complete = all(
+        subdir in listed for totals in listed.values() for subdir in totals.subdirs
+    )
+    if complete:
+        return listed_size, listed_count, [listed_size] * 2, [listed_count] * 2
+
+    size, size_interval = _estimate(size_samples, listed_size)
+    count, count_interval = _estimate(count_samples, listed_count)
+    return size, count, size_interval, count_interval
+
+
+def _estimate(
+    values: list[int],
+    lower_bound: int
+) -> tuple[int, list[int]]:
+    """The mean of the samples and its 95% confidence interval, neither
+    of which can be less than lower_bound."""
+    mean = statistics.fmean(values)
+    margin = 1.96 * statistics.stdev(values) / math.sqrt(len(values)) if len(values) > 1 else mean
+    estimate = max(round(mean), lower_bound)
+    return estimate, [max(round(mean - margin), lower_bound), max(round(mean + margin), estimate)]
+
+
 def extract_collection_title(facomponent_dir: pathlib.Path) -> str:
     if re.match(r'M\d+\_FAcomponents', facomponent_dir.name):
         return facomponent_dir.name
@@ -137,8 +887,22 @@ def create_report(
     input: list[list[str, int, int]],
     report: dict
 ) -> dict:
+    indexes = {}
     for er in input:
-        report = process_item(er, report)
+        *parents, title = er[0].split('/')
+        # although not recommended, an extra character is allowed after the ER number
+        parts = re.match(r'(ER \d+)[^\d]?\s(.*)', title)
+        item = {
+            'title': title,
+            'er_number': parts.group(1),
+            'er_name': parts.group(2),
+            'file_size': er[1],
+            'file_count': er[2]
+        }
+        # optional fields, such as allocated_size, follow the ER name
+        if len(er) > 4:
+            item.update(er[4])
+        insert_report_item(report, parents, item, indexes)
 
     return report
 
@@ -147,52 +911,450 @@ def process_item(
     input: list[str, int, int],
     report: dict
 ) -> dict:
-    if not '/' in input[0]:
-        # although not recommended, an extra character is allowed after the ER number
-        parts = re.match(r'(ER \d+)[^\d]?\s(.*)', input[0])
-        report['children'].append({
-            'title': input[0],
-            'er_number': parts.group(1),
-            'er_name': parts.group(2),
-            'file_size': input[1],
-            'file_count': input[2]
-        })
+    return create_report([input], report)
+
+def write_report(
+    report: dict,
+    dest: pathlib.Path,
+    compact: bool = False
+) -> None:
+    write_report_json(report, dest, compact)
+
+class CollectionWatcher:
+    """Keep the report of one collection up to date as its files change,
+    using inotify. After one full scan, only the folders that changed are
+    listed again and only their ERs are totalled again. The report is
+    rewritten once changes have paused for debounce seconds, or every
+    max_delay seconds while they keep coming. Linux only."""
+
+    def __init__(
+        self,
+        facomponent_dir: pathlib.Path,
+        destination: pathlib.Path,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        inodes: bool = False,
+        histograms: bool = False,
+        warning_sample: int = DEFAULT_SAMPLE_SIZE,
+        compact_json: bool = False
+    ) -> None:
+        self.root = str(facomponent_dir)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.inodes = inodes
+        self.histograms = histograms
+        self.compact_json = compact_json
+        self.colltitle = extract_collection_title(facomponent_dir)
+        self.report_file = destination.joinpath(f'{self.colltitle}.json')
+        self._file_warnings = FileWarnings(LOGGER, ER_FILE_MESSAGES, warning_sample)
+        self._inotify = Inotify()
+        # watch descriptors by path and paths by watch descriptor
+        self._watched = {}
+        self._watches = {}
+        # ERs in tree order, their report items, and the totals and ER of
+        # every folder inside their objects folders
+        self._ers = []
+        self._items = {}
+        self._objects_dirs = {}
+        self._objects_ers = {}
+
+    def scan(self) -> None:
+        """Scan the whole collection and write the report."""
+        for wd in self._watches:
+            self._inotify.rm_watch(wd)
+        self._watched.clear()
+        self._watches.clear()
+        self._items.clear()
+        self._objects_dirs.clear()
+        self._objects_ers.clear()
+
+        self._ers = self._scan_tree()
+        for er_path, _ in self._ers:
+            objects_dir = os.path.join(er_path, 'objects')
+            if os.path.isdir(objects_dir):
+                self._scan_objects_tree(objects_dir, er_path)
+        self._update_items({er_path for er_path, _ in self._ers})
+        self.write()
+
+    def run(self) -> None:
+        """Scan the collection, then keep its report up to date until interrupted."""
+        self.scan()
+        while True:
+            self.process_events()
+
+    def process_events(
+        self,
+        timeout: Union[float, None] = None
+    ) -> bool:
+        """Wait up to timeout seconds, or forever with None, for changes, then
+        gather changes until they pause and update the report.
+        Returns whether the report was updated."""
+        events = self._inotify.read_events(timeout)
+        if not events:
+            return False
+
+        changed_dirs = set()
+        overflow = False
+        first_event = time.monotonic()
+        while events:
+            for event in events:
+                if event.mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                path = self._watches.get(event.wd)
+                if path is None:
+                    continue
+                if event.mask & IN_IGNORED:
+                    # the folder is gone or was unwatched
+                    del self._watches[event.wd]
+                    if self._watched.get(path) == event.wd:
+                        del self._watched[path]
+                changed_dirs.add(path)
+
+            wait_for = min(self.debounce, self.max_delay - (time.monotonic() - first_event))
+            if wait_for <= 0:
+                break
+            events = self._inotify.read_events(wait_for)
+
+        if overflow:
+            LOGGER.warning('Too many changes to follow one by one, scanning the collection again')
+            self.scan()
+        else:
+            self._apply(changed_dirs)
+        return True
+
+    def write(self) -> None:
+        ers = [self._items[er_path] for er_path, _ in self._ers if self._items.get(er_path)]
+        report = create_report(ers, {'title': self.colltitle, 'children': []})
+        write_report(report, self.report_file, self.compact_json)
+
+    def close(self) -> None:
+        self._file_warnings.close()
+        self._inotify.close()
+
+    def __enter__(self) -> 'CollectionWatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _apply(self, changed_dirs: set[str]) -> None:
+        changed_ers = set()
+
+        if any(path not in self._objects_dirs for path in changed_dirs):
+            # the series and ER folders changed, so find the ERs again
+            old_ers = set(self._ers)
+            self._ers = self._scan_tree()
+            for er_path, er in self._ers:
+                objects_dir = os.path.join(er_path, 'objects')
+                exists = os.path.isdir(objects_dir)
+                if (er_path, er) not in old_ers:
+                    self._forget(objects_dir)
+                    changed_ers.add(er_path)
+                elif exists != (objects_dir in self._objects_dirs):
+                    changed_ers.add(er_path)
+                if exists and objects_dir not in self._objects_dirs:
+                    self._scan_objects_tree(objects_dir, er_path)
+                elif not exists:
+                    self._forget(objects_dir)
+            current = {er_path for er_path, _ in self._ers}
+            for er_path, _ in old_ers:
+                if er_path not in current:
+                    self._forget(os.path.join(er_path, 'objects'))
+                    self._items.pop(er_path, None)
+            self._forget_stale_tree_watches()
+
+        for path in changed_dirs:
+            old_totals = self._objects_dirs.get(path)
+            if old_totals is None:
+                continue
+            er_path = self._objects_ers[path]
+            totals = _list_objects_dir(path, self.inodes)
+            self._objects_dirs[path] = totals
+            for subdir in set(old_totals.subdirs) - set(totals.subdirs):
+                self._forget(subdir)
+            for subdir in set(totals.subdirs) - set(old_totals.subdirs):
+                self._scan_objects_tree(subdir, er_path)
+            changed_ers.add(er_path)
+
+        self._update_items(changed_ers)
+        self.write()
+
+    def _watch(self, path: str) -> None:
+        try:
+            wd = self._inotify.add_watch(path)
+        except FileNotFoundError:
+            return None
+        # a moved folder keeps its watch descriptor
+        self._watches[wd] = path
+        self._watched[path] = wd
+
+    def _forget(self, path: str) -> None:
+        """Stop watching a folder of an objects folder and everything in it."""
+        prefix = path + os.sep
+        for forgotten in [
+            p for p in self._objects_dirs if p == path or p.startswith(prefix)
+        ]:
+            del self._objects_dirs[forgotten]
+            del self._objects_ers[forgotten]
+            wd = self._watched.pop(forgotten, None)
+            if wd is not None and self._watches.get(wd) == forgotten:
+                self._inotify.rm_watch(wd)
+                del self._watches[wd]
+
+    def _forget_stale_tree_watches(self) -> None:
+        for path, wd in list(self._watched.items()):
+            if path in self._objects_dirs or os.path.isdir(path):
+                continue
+            del self._watched[path]
+            if self._watches.get(wd) == path:
+                self._inotify.rm_watch(wd)
+                del self._watches[wd]
+
+    def _scan_tree(self) -> list[tuple[str, str]]:
+        """Watch and list every folder above the objects folders.
+        Returns the ERs in the same order as find_ers."""
+        ers = []
+        stack = [(self.root, '', False)]
+        while stack:
+            path, rel_path, in_er = stack.pop()
+            # watched before listing so nothing is missed in between
+            self._watch(path)
+            found, subdirs = _scan_tree_dir(path, rel_path, in_er)
+            ers.extend(found)
+            stack.extend(reversed(subdirs))
+        return ers
+
+    def _scan_objects_tree(self, path: str, er_path: str) -> None:
+        stack = [path]
+        while stack:
+            path = stack.pop()
+            self._watch(path)
+            totals = _list_objects_dir(path, self.inodes)
+            self._objects_dirs[path] = totals
+            self._objects_ers[path] = er_path
+            stack.extend(totals.subdirs)
+
+    def _update_items(self, er_paths: set[str]) -> None:
+        for er_path, er in self._ers:
+            if er_path not in er_paths:
+                continue
+            objects_dir = os.path.join(er_path, 'objects')
+            stats = None
+            if objects_dir in self._objects_dirs:
+                stats = _sum_objects_dirs(
+                    objects_dir, lambda path: self._objects_dirs.get(path, EMPTY_DIR)
+                )
+            self._items[er_path] = _er_item(
+                er_path, er, stats, self.inodes, self.histograms, self._file_warnings
+            )
+
+
+def process_collection(
+    facomponent_dir: pathlib.Path,
+    destination: pathlib.Path,
+    workers: Union[int, None] = None,
+    inodes: bool = False,
+    histograms: bool = False,
+    cache: bool = False,
+    verify_cache: bool = False,
+    estimate: bool = False,
+    samples: int = 30,
+    warning_sample: int = DEFAULT_SAMPLE_SIZE,
+    list_file_warnings: bool = False,
+    compact_json: bool = False
+) -> pathlib.Path:
+    """Run every step from folder tree to JSON report for a single collection.
+    Returns the path of the json file."""
+    LOGGER.info(f'collecting data from {facomponent_dir}')
+    colltitle = extract_collection_title(facomponent_dir)
+    if estimate:
+        ers = estimate_ers(facomponent_dir, samples)
+        stub_report = {'title': colltitle, 'estimate': True, 'children': []}
     else:
-        parent, child = input[0].split('/', maxsplit=1)
-        input[0] = child
-        for item in report['children']:
-            if item['title'] == parent:
-                item = process_item(input, item)
-                return report
-
-        report['children'].append(
-            process_item(input, {'title': parent, 'children': []})
+        ers = scan_collection(
+            facomponent_dir, destination, colltitle, workers, inodes, histograms,
+            cache, verify_cache, warning_sample, list_file_warnings
         )
+        stub_report = {'title': colltitle, 'children': []}
 
-    return report
+    LOGGER.info('creating report')
+    full_report = create_report(ers, stub_report)
 
-def write_report(
-    report: dict,
-    dest: pathlib.Path
+    LOGGER.info('writing report')
+    report_file = destination.joinpath(f'{colltitle}.json')
+    write_report(full_report, report_file, compact_json)
+
+    return report_file
+
+
+def scan_collection(
+    facomponent_dir: pathlib.Path,
+    destination: pathlib.Path,
+    colltitle: Union[str, None],
+    workers: Union[int, None] = None,
+    inodes: bool = False,
+    histograms: bool = False,
+    cache: bool = False,
+    verify_cache: bool = False,
+    warning_sample: int = DEFAULT_SAMPLE_SIZE,
+    list_file_warnings: bool = False
+) -> list[str, int, int, str]:
+    name = colltitle or facomponent_dir.name
+    stat_cache = None
+    if cache or verify_cache:
+        cache_file = destination.joinpath(f'{name}_extents_cache.sqlite')
+        stat_cache = StatCache(cache_file, facomponent_dir, verify_cache, inodes)
+    sidecar = None
+    if list_file_warnings:
+        sidecar = destination.joinpath(f'{name}_file_warnings.tsv')
+    with FileWarnings(LOGGER, ER_FILE_MESSAGES, warning_sample, sidecar) as file_warnings:
+        ers = get_ers(
+            facomponent_dir, workers, stat_cache, inodes, histograms, file_warnings
+        )
+    if stat_cache:
+        for rel_path, (cached_size, cached_count), (size, count) in stat_cache.drift:
+            LOGGER.warning(
+                f'{rel_path} has changed since it was cached: '
+                f'cached {cached_size} bytes in {cached_count} files, found {size} bytes in {count} files'
+            )
+        if verify_cache:
+            LOGGER.info(f'{len(stat_cache.drift)} folders differed from the cache')
+        stat_cache.save()
+
+    return ers
+
+
+def _process_batch_item(
+    facomponent_dir: pathlib.Path,
+    destination: pathlib.Path,
+    options: dict
+) -> tuple[Union[tuple[pathlib.Path, float], None], Union[str, None]]:
+    """Worker for process_batch, returns the report file and the seconds it took."""
+    start = time.monotonic()
+    try:
+        report_file = process_collection(facomponent_dir, destination, **options)
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+    return (report_file, time.monotonic() - start), None
+
+
+def process_batch(
+    facomponent_dirs: list[pathlib.Path],
+    destination: pathlib.Path,
+    batch_workers: Union[int, None] = None,
+    **options
+) -> tuple[dict[pathlib.Path, pathlib.Path], dict[pathlib.Path, str]]:
+    """Create a JSON report for each collection on a shared pool of
+    batch_workers processes. Collections that took longest on the previous run start
+    first, after any collections that have not been run before, so the
+    batch takes about as long as its largest collection. Each report is
+    written as soon as its collection is done.
+    options are passed on to process_collection.
+    Returns dicts mapping each collection to its json file
+    or to the reason it failed."""
+    durations = load_durations(destination)
+    facomponent_dirs = schedule_collections(facomponent_dirs, durations)
+
+    succeeded = {}
+    failed = {}
+    batch = run_batch(
+        ProcessPoolExecutor(max_workers=batch_workers),
+        _process_batch_item, facomponent_dirs, destination, options
+    )
+    for path, result, error in batch:
+        if error:
+            LOGGER.error(f'{path} could not be processed. {error}')
+            failed[path] = error
+            continue
+
+        report_file, seconds = result
+        durations[str(path.resolve())] = round(seconds, 3)
+        if report_file in succeeded.values():
+            LOGGER.warning(
+                f'{path} has the same collection title as another collection in the batch. {report_file} was overwritten.'
+            )
+        succeeded[path] = report_file
+
+    save_durations(destination, durations)
+
+    return succeeded, failed
+
+
+def schedule_collections(
+    facomponent_dirs: list[pathlib.Path],
+    durations: dict[str, float]
+) -> list[pathlib.Path]:
+    """Order collections longest previous run first. Collections without
+    a previous run could be any size, so they go before all of them."""
+    return sorted(
+        dict.fromkeys(facomponent_dirs),
+        key=lambda path: durations.get(str(path.resolve()), math.inf),
+        reverse=True
+    )
+
+
+def load_durations(destination: pathlib.Path) -> dict[str, float]:
+    """Seconds each collection took on its last successful batch run, by path."""
+    try:
+        with open(destination.joinpath(DURATIONS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_durations(
+    destination: pathlib.Path,
+    durations: dict[str, float]
 ) -> None:
-    with open(dest, 'w') as f:
-        json.dump(report, f)
+    write_json_atomic(durations, destination.joinpath(DURATIONS_FILE), indent=2)
+
 
 def main():
     args = parse_args()
 
-    LOGGER.info('collecting data from file system')
-    colltitle = extract_collection_title(args.dir)
-    ers = get_ers(args.dir)
+    options = {
+        'workers': args.workers,
+        'inodes': args.inodes,
+        'histograms': args.histograms,
+        'cache': args.cache,
+        'verify_cache': args.verify_cache,
+        'estimate': args.estimate,
+        'samples': args.samples,
+        'warning_sample': args.warning_sample,
+        'list_file_warnings': args.list_file_warnings,
+        'compact_json': args.compact_json
+    }
 
-    LOGGER.info('creating report')
-    stub_report = {'title': colltitle, 'children': []}
-    full_report = create_report(ers, stub_report)
+    if args.watch:
+        watcher = CollectionWatcher(
+            args.dir, args.output, args.debounce,
+            inodes=args.inodes,
+            histograms=args.histograms,
+            warning_sample=args.warning_sample,
+            compact_json=args.compact_json
+        )
+        with watcher:
+            print(f'Watching {args.dir}, press Ctrl+C to stop ...')
+            try:
+                watcher.run()
+            except KeyboardInterrupt:
+                pass
+        return None
 
+    if args.dir:
+        process_collection(args.dir, args.output, **options)
+        return None
 
-    LOGGER.info('writing report')
-    report_file = args.output.joinpath(f'{colltitle}.json')
-    write_report(full_report, report_file)
+    print(f'Creating reports for {len(args.batch)} collections ...')
+    succeeded, failed = process_batch(
+        args.batch, args.output, batch_workers=args.batch_workers, **options
+    )
+    summary_path = write_batch_summary(args.output, succeeded, failed)
+
+    print(f'{len(succeeded)} reports written, {len(failed)} failed. See {summary_path}')
+    for path, error in failed.items():
+        print(f'  {path}: {error}')
 
 
 if __name__=="__main__":
@@ -0,0 +1,92 @@
+import json
+import os
+import pathlib
+
+
+def write_report_json(
+    report: dict,
+    dest: pathlib.Path,
+    compact: bool = False
+) -> None:
+
+    '''
+    writes a nested report dict to dest with json.dump, or drops all
+    whitespace with compact.
+    '''
+
+    separators = (',', ':') if compact else (', ', ': ')
+    write_json_atomic(report, dest, separators=separators)
+
+    return None
+
+
+def write_json_atomic(
+    data,
+    dest: pathlib.Path,
+    **dump_options
+) -> None:
+
+    '''
+    writes data to dest with json.dump, passing on dump_options. The data
+    is written to a temporary file next to dest and renamed into place,
+    so dest is never left half written.
+    '''
+
+    dest = pathlib.Path(dest)
+    tmp_dest = dest.with_name(f'.{dest.name}.{os.getpid()}.tmp')
+
+    try:
+        with open(tmp_dest, 'w', buffering=1024 * 1024) as f:
+            json.dump(data, f, **dump_options)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_dest, dest)
+    except BaseException:
+        tmp_dest.unlink(missing_ok=True)
+        raise
+
+    return None
+
+
+def insert_report_item(
+    report: dict,
+    parents: list[str],
+    item: dict,
+    indexes: dict[int, dict[str, dict]]
+) -> None:
+
+    '''
+    adds item to a nested report dict under its parents' titles, creating
+    any parent that is missing. Children keep the order they are first
+    seen in. indexes holds each level's children by title, keyed by the
+    id of the level's dict, so an item costs the length of its hierarchy
+    rather than a search of every sibling. Pass the same dict for every
+    item of a report.
+    '''
+
+    level = report
+    for parent in parents:
+        index = _child_index(level, indexes)
+        child = index.get(parent)
+        if child is None:
+            child = index[parent] = {'title': parent, 'children': []}
+            level['children'].append(child)
+        level = child
+
+    _child_index(level, indexes).setdefault(item['title'], item)
+    level['children'].append(item)
+
+    return None
+
+
+def _child_index(
+    level: dict,
+    indexes: dict[int, dict[str, dict]]
+) -> dict[str, dict]:
+
+    index = indexes.get(id(level))
+    if index is None:
+        index = indexes[id(level)] = {}
+        for child in level['children']:
+            index.setdefault(child['title'], child)
+    return index
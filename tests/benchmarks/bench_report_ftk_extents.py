@@ -0,0 +1,173 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from digarch_scripts.report import report_ftk_extents as rfe
+
+from .ftk_report_generator import generate_ftk_report
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed(stages: list[dict], name: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages.append({
+        'stage': name,
+        'seconds': round(time.perf_counter() - start, 3),
+        'peak_rss_mb': round(_peak_rss_mb(), 1)
+    })
+    return result
+
+
+def run_tree(path: pathlib.Path) -> list[dict]:
+    '''
+    times each stage of the default, fully parsed report path
+    '''
+
+    stages = []
+    tree = _timed(stages, 'parse_xml', rfe.parse_xml, path)
+    ers = _timed(stages, 'create_er_list', rfe.create_er_list, tree)
+    tables = _timed(stages, 'transform_bookmark_tables', rfe.transform_bookmark_tables, tree)
+    extents = _timed(stages, 'add_extents_to_ers', rfe.add_extents_to_ers, ers, tables)
+    title = _timed(stages, 'extract_collection_title', rfe.extract_collection_title, tree)
+    _timed(stages, 'build_report', rfe.build_report, extents, {'title': title, 'children': []})
+    return stages
+
+
+def run_tree_compact(path: pathlib.Path) -> list[dict]:
+    '''
+    times the fully parsed report path with compact bookmark columns
+    '''
+
+    stages = []
+    tree = _timed(stages, 'parse_xml', rfe.parse_xml, path)
+    ers = _timed(stages, 'create_er_list', rfe.create_er_list, tree)
+    tables = _timed(stages, 'transform_bookmark_tables', rfe.transform_bookmark_tables, tree, True)
+    _timed(stages, 'add_extents_to_ers', rfe.add_extents_to_ers, ers, tables)
+    return stages
+
+
+def run_stream(path: pathlib.Path) -> list[dict]:
+    '''
+    times the iterparse report path with compact bookmark columns
+    '''
+
+    stages = []
+    ers, tables, title = _timed(stages, 'iterparse_report', rfe.iterparse_report, path, True)
+    _timed(stages, 'add_extents_to_ers', rfe.add_extents_to_ers, ers, tables)
+    return stages
+
+
+def run_parallel(path: pathlib.Path) -> list[dict]:
+    '''
+    times the report path that parses bookmark chunks in parallel.
+    Peak RSS only covers the main process.
+    '''
+
+    stages = []
+    ers, bookmark_index, title = _timed(
+        stages, 'read_report', rfe.read_report, path,
+        compact=True, parse_workers=os.cpu_count()
+    )
+    _timed(stages, 'summarize_er_extents', rfe.summarize_er_extents, ers, bookmark_index)
+    return stages
+
+
+MODES = {
+    'tree': run_tree,
+    'tree-compact': run_tree_compact,
+    'stream': run_stream,
+    'parallel': run_parallel,
+}
+
+
+def _run_mode(mode: str, path: pathlib.Path) -> list[dict]:
+    # ER warnings would swamp the timings
+    rfe.LOGGER.setLevel(logging.ERROR)
+    return MODES[mode](path)
+
+
+def run_benchmarks(
+    workdir: pathlib.Path,
+    rows: list[int],
+    modes: list[str],
+    ers: int = 400,
+    depth: int = 3
+) -> list[dict]:
+
+    '''
+    generates a report for each row count, unless one already exists in
+    workdir, and times every mode in a fresh process so that peak RSS
+    only reflects that mode.
+    '''
+
+    results = []
+    # fresh interpreters keep the memory of one run out of the next
+    context = multiprocessing.get_context('spawn')
+    for row_count in rows:
+        files_per_er = max(row_count // ers, 1)
+        report = workdir / f'synthetic_{ers}ers_{files_per_er}files_{depth}deep.xml'
+        if not report.exists():
+            print(f'Generating {report} ...', file=sys.stderr)
+            generate_ftk_report(
+                report, ers=ers, files_per_er=files_per_er, depth=depth, zero_byte_every=1000
+            )
+
+        for mode in modes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                stages = executor.submit(_run_mode, mode, report).result()
+            result = {
+                'rows': ers * files_per_er,
+                'report_mb': round(report.stat().st_size / 1024 / 1024, 1),
+                'mode': mode,
+                'stages': stages
+            }
+            results.append(result)
+            for stage in stages:
+                print(
+                    f'{result["rows"]:>9} rows  {mode:<12} {stage["stage"]:<26}'
+                    f'{stage["seconds"]:>9.3f} s {stage["peak_rss_mb"]:>9.1f} MB peak'
+                )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Time each stage of report_ftk_extents on synthetic reports'
+    )
+    parser.add_argument(
+        '--workdir', type=pathlib.Path, default=pathlib.Path('.benchmarks'),
+        help='where generated reports are kept between runs'
+    )
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--ers', type=int, default=400)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--output', type=pathlib.Path, help='save results as JSON')
+    args = parser.parse_args()
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    results = run_benchmarks(args.workdir, args.rows, args.modes, args.ers, args.depth)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import pathlib
+import random
+from xml.sax.saxutils import escape
+
+FO = 'http://www.w3.org/1999/XSL/Format'
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    f'<fo:root xmlns:xs="http://www.w3.org/2001/XMLSchema" font-family="arial unicode ms" font-size="10pt" xmlns:fo="{FO}">'
+    '<fo:layout-master-set>'
+    + ''.join(
+        f'<fo:simple-page-master master-name="{name}"><fo:region-body region-name="body"/></fo:simple-page-master>'
+        for name in ['TOC', 'caseInfoPage', 'bookmarksPage', 'index']
+    )
+    + '</fo:layout-master-set>'
+)
+
+STATIC_CONTENT = (
+    '<fo:static-content flow-name="xsl-region-after"><fo:block text-align="center" font-size="8pt">'
+    'Page <fo:page-number/> of <fo:page-number-citation ref-id="last-page"/></fo:block></fo:static-content>'
+)
+
+TOC_ENTRY = (
+    '<fo:block start-indent="{indent}pt" text-align-last="justify">{title}'
+    '<fo:leader leader-pattern="dots" leader-alignment="reference-area"/>'
+    '<fo:basic-link color="blue" text-decoration="underline" internal-destination="{ref}">'
+    '<fo:page-number-citation ref-id="{ref}"/></fo:basic-link></fo:block>'
+)
+
+BOOKMARK_HEADING = (
+    '<fo:block width="100%" border-style="solid" border-width="1pt" font-weight="bold" id="{ref}">'
+    'Bookmark: {title}</fo:block>'
+)
+
+TABLE_ROW = (
+    '<fo:table-row><fo:table-cell font-weight="bold"><fo:block>{label}</fo:block></fo:table-cell>'
+    '<fo:table-cell padding-left="3pt"><fo:block>{value}</fo:block></fo:table-cell></fo:table-row>'
+)
+
+
+def _file_table(table_id: str, name: str, path: str, size: int, md5: str) -> str:
+    rows = [
+        ('File Comments', ''),
+        ('Name', name),
+        ('Physical Size', 'n/a'),
+        ('Logical Size', f'{size} B'),
+        ('Created Date', '5/2/2023 12:20:46 PM (2023-05-02 16:20:46 UTC)'),
+        ('Modified Date', '5/3/2023 1:19:18 PM (2023-05-03 17:19:18 UTC)'),
+        ('Accessed Date', '5/3/2023 1:20:07 PM (2023-05-03 17:20:07 UTC)'),
+        ('Path', path),
+        ('MD5 Hash', md5),
+        ('Folder', 'False'),
+    ]
+    return (
+        f'<fo:table width="100%" table-layout="fixed" id="{table_id}">'
+        '<fo:table-column column-width="23%"/><fo:table-column/><fo:table-body>'
+        + ''.join(TABLE_ROW.format(label=label, value=escape(value)) for label, value in rows)
+        + '</fo:table-body></fo:table>'
+    )
+
+
+def _er_hierarchy(er: int, depth: int, branching: int, ers_per_series: int) -> list[str]:
+    '''
+    series titles above an ER. ERs are grouped ers_per_series at a time
+    and the groups are spread over branching series at every level.
+    '''
+
+    group = er // ers_per_series
+    titles = []
+    for level in reversed(range(depth)):
+        position = (group // branching ** level) % branching
+        level_name = ('sub' * len(titles) + 'series').capitalize()
+        titles.append(f'{level_name} {position + 1}')
+    return titles
+
+
+def generate_ftk_report(
+    dest: pathlib.Path,
+    ers: int = 100,
+    files_per_er: int = 100,
+    depth: int = 2,
+    branching: int = 4,
+    ers_per_series: int = 10,
+    zero_byte_every: int = 0,
+    title: str = 'M99999 Synthetic Test',
+    seed: int = 0
+) -> dict[str, int]:
+
+    '''
+    writes a synthetic FTK FO report with the same structure as FTK's
+    bookmark report. ERs are nested depth series deep under a single
+    collection entry and each has files_per_er file tables.
+    With zero_byte_every, every nth file is empty.
+    The report is written as it is generated, so very large reports
+    do not need to fit in memory.
+    Returns the number of ERs, files and bytes in the report.
+    '''
+
+    rng = random.Random(seed)
+    totals = {'ers': ers, 'files': 0, 'bytes': 0}
+
+    toc = [TOC_ENTRY.format(indent=24, title='Synthetic papers', ref='bk1')]
+    er_refs = []
+    previous = []
+    ref = 1
+    for er in range(ers):
+        hierarchy = _er_hierarchy(er, depth, branching, ers_per_series)
+        # only open the series that differ from the previous ER
+        shared = 0
+        while (
+            shared < min(len(hierarchy), len(previous))
+            and hierarchy[shared] == previous[shared]
+        ):
+            shared += 1
+        for level in range(shared, len(hierarchy)):
+            ref += 1
+            toc.append(TOC_ENTRY.format(
+                indent=36 + 12 * level, title=hierarchy[level], ref=f'bk{ref}'
+            ))
+        previous = hierarchy
+
+        ref += 1
+        er_title = f'ER {er + 1}: Synthetic files {er + 1}, 2023'
+        toc.append(TOC_ENTRY.format(
+            indent=36 + 12 * len(hierarchy), title=er_title, ref=f'bk{ref}'
+        ))
+        er_refs.append((ref, er_title))
+
+    with open(dest, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+
+        f.write('<fo:page-sequence master-reference="TOC"><fo:flow flow-name="body">')
+        f.write(TOC_ENTRY.format(indent=12, title='Shared', ref='bk0'))
+        f.writelines(toc)
+        f.write('</fo:flow></fo:page-sequence>')
+
+        f.write('<fo:page-sequence master-reference="caseInfoPage">')
+        f.write(STATIC_CONTENT)
+        f.write('<fo:flow flow-name="body"><fo:table table-layout="fixed" width="100%"><fo:table-body>')
+        f.write(TABLE_ROW.format(label='Version', value='AccessData Forensic Toolkit Version: 7.1.0.290'))
+        f.write(TABLE_ROW.format(label='Case Name', value=escape(title)))
+        f.write('</fo:table-body></fo:table></fo:flow></fo:page-sequence>')
+
+        f.write('<fo:page-sequence master-reference="bookmarksPage">')
+        f.write(STATIC_CONTENT)
+        f.write('<fo:flow flow-name="body">')
+        f.write('<fo:block id="BookmarksMainSection" font-weight="bold">All Bookmarks</fo:block>')
+        for ref, er_title in er_refs:
+            f.write(BOOKMARK_HEADING.format(ref=f'bk{ref}', title=escape(er_title)))
+            for i in range(files_per_er):
+                totals['files'] += 1
+                if zero_byte_every and totals['files'] % zero_byte_every == 0:
+                    size = 0
+                else:
+                    size = rng.randint(1, 10_000_000)
+                totals['bytes'] += size
+                name = f'file_{i}.txt'
+                f.write(_file_table(
+                    f'bf{ref}_{i}', name, f'er_{ref}/{name}', size, f'{rng.getrandbits(128):032x}'
+                ))
+        f.write('</fo:flow></fo:page-sequence>')
+
+        f.write('<fo:page-sequence master-reference="index">')
+        f.write(STATIC_CONTENT)
+        f.write('<fo:flow flow-name="body"><fo:block id="last-page"/></fo:flow></fo:page-sequence>')
+        f.write('</fo:root>')
+
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write a synthetic FTK FO report')
+    parser.add_argument('dest', type=pathlib.Path)
+    parser.add_argument('--ers', type=int, default=100)
+    parser.add_argument('--files-per-er', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--zero-byte-every', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    totals = generate_ftk_report(
+        args.dest,
+        ers=args.ers,
+        files_per_er=args.files_per_er,
+        depth=args.depth,
+        zero_byte_every=args.zero_byte_every,
+        seed=args.seed
+    )
+    print(f'{args.dest}: {totals["ers"]} ERs, {totals["files"]} files, {totals["bytes"]} bytes')
+
+
+if __name__ == '__main__':
+    main()
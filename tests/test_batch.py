@@ -0,0 +1,39 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from digarch_scripts.batch import run_batch, write_batch_summary
+
+
+def _halve(n: int):
+    if n % 2:
+        return None, f'{n} is odd'
+    return n // 2, None
+
+
+def _exit(n: int):
+    os._exit(1)
+
+
+def test_run_batch_yields_results_and_errors():
+    """Every item should come back with its result or its error"""
+    results = run_batch(ThreadPoolExecutor(max_workers=2), _halve, range(4))
+
+    assert sorted(results) == [(0, 0, None), (1, None, '1 is odd'), (2, 1, None), (3, None, '3 is odd')]
+
+def test_run_batch_survives_dead_worker():
+    """A worker process that dies should fail its items, not the batch"""
+    results = list(run_batch(ProcessPoolExecutor(max_workers=1), _exit, [1, 2]))
+
+    assert sorted(item for item, _, _ in results) == [1, 2]
+    assert all(error.startswith('BrokenProcessPool') for _, _, error in results)
+
+def test_write_batch_summary(tmp_path):
+    summary_path = write_batch_summary(tmp_path, {'a': tmp_path / 'a.json'}, {'b': 'failed'})
+
+    with open(summary_path) as f:
+        assert json.load(f) == {
+            'succeeded': {'a': str(tmp_path / 'a.json')},
+            'failed': {'b': 'failed'}
+        }
+    assert summary_path == tmp_path / 'batch_summary.json'
@@ -0,0 +1,64 @@
+import logging
+
+from digarch_scripts.file_warnings import HIDDEN, ZERO_BYTE, FileWarnings
+
+LOGGER = logging.getLogger(__name__)
+
+MESSAGES = {
+    ZERO_BYTE: '{group} has 0-byte file {path}',
+    HIDDEN: '{group} has hidden file {path}',
+}
+
+
+def test_few_files_are_logged_one_by_one(caplog):
+    """Groups that fit in the sample keep one message per file"""
+    file_warnings = FileWarnings(LOGGER, MESSAGES, sample_size=2)
+    file_warnings.add('ER 1', ZERO_BYTE, 'a.txt')
+    file_warnings.add('ER 1', HIDDEN, '.DS_Store')
+    file_warnings.log_group('ER 1')
+
+    assert caplog.messages == ['ER 1 has 0-byte file a.txt', 'ER 1 has hidden file .DS_Store']
+
+
+def test_many_files_are_summarized(caplog):
+    """Groups past the sample get a single line with counts and a sample"""
+    file_warnings = FileWarnings(LOGGER, MESSAGES, sample_size=2)
+    for i in range(1000):
+        file_warnings.add('ER 1', ZERO_BYTE, f'{i}.txt')
+    file_warnings.add('ER 1', HIDDEN, '.DS_Store')
+    file_warnings.log_group('ER 1')
+
+    assert caplog.messages == [
+        'ER 1 contains 1000 0-byte files and 1 hidden file, including: 0.txt, 1.txt, .DS_Store. '
+        'Review these files with the processing archivist.'
+    ]
+
+
+def test_groups_are_logged_separately(caplog):
+    file_warnings = FileWarnings(LOGGER, MESSAGES)
+    file_warnings.add('ER 1', ZERO_BYTE, 'a.txt')
+    file_warnings.add('ER 2', ZERO_BYTE, 'b.txt')
+    file_warnings.log_group('ER 2')
+    file_warnings.log_group('ER 3')
+
+    assert caplog.messages == ['ER 2 has 0-byte file b.txt']
+
+
+def test_sidecar_lists_every_file(tmp_path, caplog):
+    sidecar = tmp_path / 'file_warnings.tsv'
+    with FileWarnings(LOGGER, MESSAGES, sample_size=1, sidecar=sidecar) as file_warnings:
+        for i in range(3):
+            file_warnings.add('ER 1', ZERO_BYTE, f'{i}.txt')
+        file_warnings.log_group('ER 1')
+
+    assert sidecar.read_text().splitlines() == [f'ER 1\t0-byte file\t{i}.txt' for i in range(3)]
+    assert f'All of them are listed in {sidecar}.' in caplog.text
+
+
+def test_sidecar_is_not_written_without_warnings(tmp_path):
+    sidecar = tmp_path / 'file_warnings.tsv'
+    sidecar.write_text('stale')
+    with FileWarnings(LOGGER, MESSAGES, sidecar=sidecar) as file_warnings:
+        file_warnings.log_group('ER 1')
+
+    assert not sidecar.exists()
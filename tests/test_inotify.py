@@ -0,0 +1,37 @@
+import sys
+
+import pytest
+
+from digarch_scripts.report import inotify
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith('linux'), reason='inotify is only on Linux'
+)
+
+
+def test_events_name_changed_files(tmp_path):
+    """Creating files and folders should be reported with their names"""
+    with inotify.Inotify() as watcher:
+        wd = watcher.add_watch(str(tmp_path))
+        tmp_path.joinpath('file.txt').write_text('abc')
+        tmp_path.joinpath('folder').mkdir()
+
+        events = watcher.read_events(timeout=1)
+
+    assert {event.wd for event in events} == {wd}
+    created = [event for event in events if event.mask & inotify.IN_CREATE]
+    assert [event.name for event in created] == ['file.txt', 'folder']
+    assert created[1].mask & inotify.IN_ISDIR
+
+
+def test_read_events_times_out(tmp_path):
+    with inotify.Inotify() as watcher:
+        watcher.add_watch(str(tmp_path))
+
+        assert watcher.read_events(timeout=0.01) == []
+
+
+def test_add_watch_on_missing_folder(tmp_path):
+    with inotify.Inotify() as watcher:
+        with pytest.raises(FileNotFoundError):
+            watcher.add_watch(str(tmp_path / 'missing'))
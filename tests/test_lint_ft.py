@@ -150,6 +150,19 @@ def test_package_has_zero_bytes_file(good_package):
 
     assert not result
 
+def test_zero_bytes_files_are_one_log_line(good_package, caplog):
+    """Test that each package logs one line however many files are found"""
+    folder = good_package / "objects" / "data" / "folder1"
+    for i in range(15):
+        folder.joinpath(f"zerobytes{i}.txt").touch()
+
+    lint_ft.package_has_no_zero_bytes_file(good_package)
+
+    assert len(caplog.records) == 1
+    assert caplog.messages[0].startswith(
+        f"{good_package.name} contains 15 0-byte files, including: "
+    )
+
 def test_metadata_folder_is_flat(good_package):
     """The metadata folder should not have folder structure"""
     result = lint_ft.metadata_folder_is_flat(good_package)
@@ -1,10 +1,14 @@
 import digarch_scripts.package.package_cloud as pc
 
 import argparse
+import errno
+import hashlib
+import json
 import os
 from pathlib import Path
 import pytest
 import shutil
+import time
 
 import bagit
 
@@ -210,6 +214,110 @@ def bag_payload(transfer_files: Path, package_base_dir: Path):
 
     return bag_payload
 
+@pytest.fixture
+def cross_device(monkeypatch: pytest.MonkeyPatch):
+    """Make every rename fail as if the destination were on another filesystem"""
+
+    def rename(self, target):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), str(self), str(target))
+
+    monkeypatch.setattr(Path, "rename", rename)
+
+
+def test_move_payload_across_devices(
+    transfer_files: Path, package_base_dir: Path, cross_device
+):
+    """Test that the payload is copied, verified and removed on EXDEV"""
+
+    source_payload = transfer_files / "rclone_files"
+    (source_payload / "subdir").mkdir()
+    (source_payload / "subdir" / "file.11").write_text("nested")
+    expected = {
+        p.relative_to(source_payload): p.read_bytes()
+        for p in source_payload.rglob("*") if p.is_file()
+    }
+    bag_dir = package_base_dir / "objects"
+
+    pc.move_payload(source_payload, bag_dir, transfer_files / "rclone.md5")
+
+    assert not any(source_payload.iterdir())
+    assert expected == {
+        p.relative_to(bag_dir / "data"): p.read_bytes()
+        for p in (bag_dir / "data").rglob("*") if p.is_file()
+    }
+
+
+def test_move_payload_across_devices_stops_on_bad_checksum(
+    transfer_files: Path, package_base_dir: Path, cross_device
+):
+    """Test that a file that doesn't match the manifest is not deleted"""
+
+    source_file = transfer_files / "rclone_files" / "file.01"
+    source_file.write_text("changed")
+    bag_dir = package_base_dir / "objects"
+
+    with pytest.raises(ValueError, match="file.01"):
+        pc.move_payload(
+            transfer_files / "rclone_files", bag_dir, transfer_files / "rclone.md5"
+        )
+
+    assert source_file.exists()
+    assert not (bag_dir / "data" / "file.01").exists()
+
+
+def test_move_metadata_across_devices(
+    transfer_files: Path, package_base_dir: Path, cross_device
+):
+    """Test that metadata files are moved across filesystems"""
+
+    source_log = transfer_files / "rclone.log"
+    contents = source_log.read_bytes()
+    pc.move_metadata_file(source_log, package_base_dir)
+
+    assert not source_log.exists()
+    assert (package_base_dir / "metadata" / "rclone.log").read_bytes() == contents
+
+
+def test_copy_file_in_blocks(transfer_files: Path, monkeypatch: pytest.MonkeyPatch):
+    """Test that a copy made a few bytes at a time matches and is hashed"""
+
+    monkeypatch.setattr(pc, "HASH_BUFFER_SIZE", 7)
+
+    src = transfer_files / "rclone_files" / "file.01"
+    dest = transfer_files / "copy.01"
+    md5 = hashlib.md5(src.read_bytes()).hexdigest()
+
+    assert pc.copy_file(src, dest, md5) == md5
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_parse_md5_line_keeps_spaces_in_paths():
+    """Test that only the separator after the digest is removed"""
+
+    digest = "d5116a5a40aab468780a3c03b417a8ac"
+
+    assert pc.parse_md5_line(f"{digest}  a  b.txt \n") == (digest, "a  b.txt ")
+    assert pc.parse_md5_line(f"{digest.upper()} *c.txt\n") == (digest, "c.txt")
+    with pytest.raises(ValueError):
+        pc.parse_md5_line(f"{digest}c.txt\n")
+
+
+def test_md5_index(tmp_path: Path):
+    """Test that digests are looked up by path from the md5 file"""
+
+    digest = "d5116a5a40aab468780a3c03b417a8ac"
+    md5_path = tmp_path / "rclone.md5"
+    md5_path.write_text(f"{digest}  a  b.txt\n\n{digest.upper()} *sub/c.txt\n")
+
+    index = pc.Md5Index(md5_path)
+    try:
+        assert index.get("a  b.txt") == digest
+        assert index.get("sub/c.txt") == digest
+        assert index.get("missing.txt") is None
+    finally:
+        index.close()
+
+
 def test_convert_md5(bag_payload: Path, transfer_files: Path):
     rclone_md5 = transfer_files / "rclone.md5"
     pc.convert_to_bagit_manifest(rclone_md5, bag_payload.parent)
@@ -227,6 +335,47 @@ def test_convert_md5(bag_payload: Path, transfer_files: Path):
         assert a_file in payload_files
 
 
+def test_convert_md5_keeps_double_spaces(transfer_files: Path, package_base_dir: Path):
+    """Test that paths with double spaces are not rewritten"""
+
+    rclone_md5 = transfer_files / "rclone.md5"
+    digest = "d5116a5a40aab468780a3c03b417a8ac"
+    rclone_md5.write_text(f"{digest}  a  b/c  d.txt\n\n{digest}  e.txt")
+
+    assert pc.convert_to_bagit_manifest(rclone_md5, package_base_dir) == 2
+    assert (package_base_dir / "manifest-md5.txt").read_text() == (
+        f"{digest}  data/a  b/c  d.txt\n{digest}  data/e.txt\n"
+    )
+    assert not rclone_md5.exists()
+
+
+def test_convert_md5_rejects_bad_lines(transfer_files: Path, package_base_dir: Path):
+    """Test that a malformed line stops the conversion without a partial manifest"""
+
+    rclone_md5 = transfer_files / "rclone.md5"
+    with open(rclone_md5, "a") as f:
+        f.write("\nnot a checksum\n")
+
+    with pytest.raises(ValueError, match="line 11"):
+        pc.convert_to_bagit_manifest(rclone_md5, package_base_dir)
+
+    assert rclone_md5.exists()
+    assert not any(package_base_dir.iterdir())
+
+
+def test_create_bag_checks_manifest_count(transfer_files: Path, package_base_dir: Path):
+    """Test that a manifest that doesn't list every payload file is caught"""
+
+    (transfer_files / "rclone_files" / "file.11").write_text("unlisted")
+
+    with pytest.raises(ValueError, match="lists 10 files but the payload has 11"):
+        pc.create_bag_in_objects(
+            transfer_files / "rclone_files",
+            transfer_files / "rclone.md5",
+            package_base_dir,
+        )
+
+
 def test_create_bag(transfer_files: Path, package_base_dir: Path):
     """Test that all tag files are created and rclone md5sums are correctly converted"""
 
@@ -280,6 +429,76 @@ def test_validate_invalid_bag(transfer_files, caplog):
     assert f"{test_bag.path} is not valid. Check the bag manifest and oxum." in caplog.text
 
 
+@pytest.fixture
+def fixity_bag(transfer_files: Path):
+    object_dir = transfer_files / "objects"
+    shutil.copytree(transfer_files / "rclone_files", object_dir)
+
+    return bagit.make_bag(str(object_dir), checksums=["md5", "sha256"])
+
+
+def test_hash_file(transfer_files: Path, monkeypatch: pytest.MonkeyPatch):
+    """Test that hashing in small reads matches hashing the whole file"""
+
+    path = transfer_files / "rclone_files" / "file.01"
+    monkeypatch.setattr(pc, "HASH_BUFFER_SIZE", 3)
+
+    assert pc.hash_file(path, ["md5", "sha256"]) == {
+        "md5": hashlib.md5(path.read_bytes()).hexdigest(),
+        "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+    }
+
+
+def test_small_files_are_hashed_in_groups(monkeypatch: pytest.MonkeyPatch):
+    """Test that small files share a task and large files get their own"""
+
+    monkeypatch.setattr(pc, "FIXITY_GROUP_SIZE", 100)
+    sizes = {"large": 500, "a": 40, "b": 30, "c": 30, "d": 10}
+
+    assert list(pc._group_files(list(sizes), sizes)) == [
+        ["large"], ["a", "b", "c"], ["d"]
+    ]
+
+
+def test_verify_fixity_of_valid_bag(fixity_bag: bagit.Bag):
+    """Test that an unchanged payload has nothing to report"""
+
+    assert pc.verify_fixity(fixity_bag, workers=2) == pc.FixityReport([], [], [])
+
+
+def test_verify_fixity_reports_changes(fixity_bag: bagit.Bag):
+    """Test that changed, missing and extra payload files are all reported"""
+
+    data_dir = Path(fixity_bag.path) / "data"
+    changed = data_dir / "file.01"
+    changed.write_bytes(bytes(b ^ 1 for b in changed.read_bytes()))
+    (data_dir / "file.02").unlink()
+    (data_dir / "file.11").write_text("extra")
+
+    report = pc.verify_fixity(fixity_bag, workers=2)
+
+    assert report.mismatched == [os.path.join("data", "file.01")]
+    assert report.missing == [os.path.join("data", "file.02")]
+    assert report.extra == [os.path.join("data", "file.11")]
+
+
+def test_validate_bag_with_changed_file(transfer_files: Path, fixity_bag, caplog):
+    """Test that a complete bag with a changed file is not valid"""
+
+    changed = Path(fixity_bag.path) / "data" / "file.01"
+    changed.write_bytes(bytes(b ^ 1 for b in changed.read_bytes()))
+
+    pc.validate_bag_in_payload(transfer_files)
+
+    assert "file.01 does not match its checksum in the manifest" in caplog.text
+    assert f"{fixity_bag.path} is not valid." in caplog.text
+
+    caplog.clear()
+    pc.validate_bag_in_payload(transfer_files, fixity=False)
+
+    assert f"{fixity_bag.path} is valid." in caplog.text
+
+
 def test_full_run(
     monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, args: list
 ):
@@ -293,3 +512,270 @@ def test_full_run(
     assert bagit.Bag(str(pkg_dir / 'objects')).validate()
 
     assert 'rclone.log' in [x.name for x in (pkg_dir / 'metadata').iterdir()]
+
+
+@pytest.fixture
+def interrupted_run(monkeypatch: pytest.MonkeyPatch, args: list):
+    """Stop a run after it has moved the log and three payload files"""
+
+    rename = Path.rename
+    moves = []
+
+    def interrupting_rename(self, target):
+        if len(moves) == 4:
+            raise KeyboardInterrupt
+        moves.append(self)
+        return rename(self, target)
+
+    monkeypatch.setattr("sys.argv", args)
+    with monkeypatch.context() as m:
+        m.setattr(Path, "rename", interrupting_rename)
+        with pytest.raises(KeyboardInterrupt):
+            pc.main()
+
+    return Path(args[-3]) / args[-1][:-7] / args[-1]
+
+
+def test_resume_interrupted_run(
+    monkeypatch: pytest.MonkeyPatch, args: list, interrupted_run: Path
+):
+    """Test that an interrupted run resumes to a valid bag"""
+
+    source_payload = Path(args[2])
+    assert len(list(source_payload.iterdir())) == 7
+
+    monkeypatch.setattr("sys.argv", args[:1] + args[-4:] + ["--resume"])
+    pc.main()
+
+    assert not any(source_payload.iterdir())
+    assert not (interrupted_run / pc.JOURNAL_NAME).exists()
+    assert bagit.Bag(str(interrupted_run / "objects")).validate()
+
+
+def test_resume_removes_partial_manifest(
+    monkeypatch: pytest.MonkeyPatch, args: list, interrupted_run: Path
+):
+    """Test that a manifest left half written by a crash is removed on resume"""
+
+    partial = interrupted_run / "objects" / ".manifest-md5.txt.99999.tmp"
+    partial.write_text("d5116a5a40aab468780a3c03b417a8ac  data/fi")
+
+    monkeypatch.setattr("sys.argv", args[:1] + args[-4:] + ["--resume"])
+    pc.main()
+
+    assert not partial.exists()
+    assert bagit.Bag(str(interrupted_run / "objects")).validate()
+
+
+def test_resume_interrupted_copy(
+    monkeypatch: pytest.MonkeyPatch, args: list, cross_device, package_base_dir: Path
+):
+    """Test that a partial copy to another filesystem is replaced on resume"""
+
+    journal = pc.Journal(package_base_dir / pc.JOURNAL_NAME)
+    source_payload = Path(args[2])
+    md5_path = Path(args[4])
+    partial = package_base_dir / "objects" / "data" / "file.01"
+    partial.parent.mkdir(parents=True)
+    journal.plan([(source_payload / "file.01", partial)])
+    partial.write_text("partial")
+    journal.close()
+
+    journal = pc.Journal(package_base_dir / pc.JOURNAL_NAME)
+    pc.move_payload(source_payload, package_base_dir / "objects", md5_path, journal)
+    journal.close()
+
+    assert not any(source_payload.iterdir())
+    assert partial.read_bytes() != b"partial"
+
+
+def test_rollback_interrupted_run(
+    monkeypatch: pytest.MonkeyPatch, args: list, transfer_files: Path
+):
+    """Test that rolling back returns every file to its source"""
+
+    before = {
+        p.relative_to(transfer_files): p.read_bytes()
+        for p in transfer_files.rglob("*") if p.is_file()
+    }
+
+    rename = Path.rename
+
+    def interrupting_rename(self, target):
+        if Path(target).name == "manifest-md5.txt":
+            raise KeyboardInterrupt
+        return rename(self, target)
+
+    monkeypatch.setattr("sys.argv", args)
+    with monkeypatch.context() as m:
+        m.setattr(Path, "rename", interrupting_rename)
+        with pytest.raises(KeyboardInterrupt):
+            pc.main()
+
+    monkeypatch.setattr("sys.argv", args[:1] + args[-4:] + ["--rollback"])
+    pc.main()
+
+    assert not (transfer_files / "ACQ_1234" / "ACQ_1234_123456").exists()
+    assert before == {
+        p.relative_to(transfer_files): p.read_bytes()
+        for p in transfer_files.rglob("*") if p.is_file()
+    }
+
+
+def test_rollback_after_convert(
+    monkeypatch: pytest.MonkeyPatch, args: list, transfer_files: Path
+):
+    """Test that rolling back rewrites the rclone md5 file from the manifest"""
+
+    md5_path = transfer_files / "rclone.md5"
+    digests = sorted(md5_path.read_text().split())
+
+    monkeypatch.setattr("sys.argv", args)
+    with monkeypatch.context() as m:
+        m.setattr(pc, "validate_bag_in_payload", lambda *args: False)
+        pc.main()
+    assert not md5_path.exists()
+
+    monkeypatch.setattr("sys.argv", args[:1] + args[-4:] + ["--rollback"])
+    pc.main()
+
+    assert sorted(md5_path.read_text().split()) == digests
+    assert len(list((transfer_files / "rclone_files").iterdir())) == 10
+
+
+def test_journal_batches_done_moves(tmp_path: Path):
+    """Test that done moves are written a batch at a time and survive a torn write"""
+
+    journal_path = tmp_path / pc.JOURNAL_NAME
+    moves = [(tmp_path / f"src{i}", tmp_path / f"dest{i}") for i in range(5)]
+    journal = pc.Journal(journal_path, batch_size=2)
+    journal.start(id="ACQ_1234_123456")
+    journal.plan(moves)
+    for src, dest in moves[:4]:
+        journal.done(src)
+    assert len(journal_path.read_text().splitlines()) == 4
+    journal.close()
+
+    with open(journal_path, "a") as f:
+        f.write('{"event": "do')
+
+    journal = pc.Journal(journal_path)
+    assert journal.resuming
+    assert journal.is_pending(moves[4][0])
+    assert not journal.is_pending(moves[3][0])
+    assert len(list(journal.planned_moves())) == 5
+    journal.close()
+
+
+@pytest.fixture
+def batch_csv(transfer_files: Path):
+    """Three carriers, each with its own copy of the fixture transfer"""
+
+    rows = ["id,payload,log,md5"]
+    for i in range(1, 4):
+        carrier = transfer_files / f"carrier_{i}"
+        carrier.mkdir()
+        shutil.copytree(transfer_files / "rclone_files", carrier / "rclone_files")
+        shutil.copy(transfer_files / "rclone.log", carrier / "rclone.log")
+        shutil.copy(transfer_files / "rclone.md5", carrier / "rclone.md5")
+        rows.append(
+            f"ACQ_1234_12345{i},{carrier / 'rclone_files'},"
+            f"{carrier / 'rclone.log'},{carrier / 'rclone.md5'}"
+        )
+
+    dest = transfer_files / "dest"
+    dest.mkdir()
+    csv_path = transfer_files / "batch.csv"
+    csv_path.write_text("\n".join(rows) + "\n")
+    return csv_path, dest
+
+
+def test_batch_requires_only_dest(
+    monkeypatch: pytest.MonkeyPatch, batch_csv: tuple
+):
+    """Test that a batch takes its carriers from the csv"""
+
+    csv_path, dest = batch_csv
+    monkeypatch.setattr(
+        "sys.argv", ["script_name", "--batch", str(csv_path), "--dest", str(dest)]
+    )
+
+    args = pc.parse_args()
+
+    assert args.batch == csv_path
+    assert args.id is None
+
+
+def test_read_batch_csv_reports_every_problem(batch_csv: tuple):
+    """Test that every bad row is reported before anything is packaged"""
+
+    csv_path, dest = batch_csv
+    rows = csv_path.read_text().splitlines()
+    rows.append(rows[1])
+    rows.append("ACQ_12,missing_payload,missing.log,missing.md5")
+    csv_path.write_text("\n".join(rows))
+
+    with pytest.raises(ValueError) as exc:
+        pc.read_batch_csv(csv_path, dest)
+
+    message = str(exc.value)
+    assert "row 5: ACQ_1234_123451 is in the batch more than once" in message
+    assert "row 5:" in message and "is used by another row" in message
+    assert "row 6: ACQ_12 does not match the expected pattern" in message
+    assert "missing_payload does not exist" in message
+    assert "row 2" not in message
+
+    csv_path.write_text("id,payload,md5\n")
+    with pytest.raises(ValueError, match="missing the columns log"):
+        pc.read_batch_csv(csv_path, dest)
+
+
+def test_batch_run(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, batch_csv: tuple
+):
+    """Test that each carrier is packaged and failures don't stop the batch"""
+
+    csv_path, dest = batch_csv
+    bad_md5 = csv_path.parent / "carrier_2" / "rclone.md5"
+    bad_md5.write_text("".join(bad_md5.read_text().splitlines(True)[1:]))
+
+    monkeypatch.setattr(
+        "sys.argv",
+        ["script_name", "--batch", str(csv_path), "--dest", str(dest), "--batch-workers", "2"],
+    )
+    pc.main()
+
+    summary = json.loads((dest / "package_batch_summary.json").read_text())
+    assert sorted(summary["succeeded"]) == ["ACQ_1234_123451", "ACQ_1234_123453"]
+    assert list(summary["failed"]) == ["ACQ_1234_123452"]
+    assert "lists 9 files but the payload has 10" in summary["failed"]["ACQ_1234_123452"]
+    for path in summary["succeeded"].values():
+        assert bagit.Bag(str(Path(path) / "objects")).validate()
+
+    stdout = capsys.readouterr().out
+    assert "2 carriers packaged, 1 failed" in stdout
+
+
+def test_batch_throttles_per_filesystem(
+    monkeypatch: pytest.MonkeyPatch, batch_csv: tuple
+):
+    """Test that carriers on one filesystem don't move files at the same time"""
+
+    csv_path, dest = batch_csv
+    items = pc.read_batch_csv(csv_path, dest)
+    active = []
+    most_active = []
+    package_files = pc.package_files
+
+    def counting_package_files(*args):
+        active.append(None)
+        most_active.append(len(active))
+        time.sleep(0.05)
+        active.pop()
+        return package_files(*args)
+
+    monkeypatch.setattr(pc, "package_files", counting_package_files)
+    succeeded, failed = pc.package_batch(items, batch_workers=3, io_per_filesystem=1)
+
+    assert len(succeeded) == 3 and not failed
+    assert max(most_active) == 1
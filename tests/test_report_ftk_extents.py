@@ -1,6 +1,9 @@
 import src.digarch_scripts.report.report_ftk_extents as rfe
+from tests.benchmarks.ftk_report_generator import generate_ftk_report
 import pytest
 import json
+import os
+import pathlib
 try:
     from lxml import etree
 except ImportError:
@@ -246,3 +249,236 @@ def test_create_correct_json(ers_with_extents_list, expected_json):
         dct = rfe.create_report(er, dct)
 
     assert dct == expected_json
+
+def test_iterparse_matches_tree_parse(parsed_report):
+    """Streaming parse should produce the same intermediate data as the tree parse"""
+    ers, bookmark_tables, coll_name = rfe.iterparse_report(
+        'tests/fixtures/report/Report.xml'
+    )
+
+    assert ers == rfe.create_er_list(parsed_report)
+    assert bookmark_tables == rfe.transform_bookmark_tables(parsed_report)
+    assert coll_name == rfe.extract_collection_title(parsed_report)
+
+def test_iterparse_quits_on_invalid_xml(tmp_path):
+    """Streaming parse should quit if XML can't be parsed"""
+    bad_xml = tmp_path / "bad.xml"
+    with open(bad_xml, 'wb') as f:
+        f.write(b"\x3c\x61\x3e\x07\x3c\x2f\x61\x3e")
+
+    msg = "FTK report cannot be parsed. Edit the unreadable characters in the report with a text editor."
+    with pytest.raises(SystemExit, match=msg):
+        rfe.iterparse_report(bad_xml)
+
+def test_parallel_parse_quits_on_invalid_xml(tmp_path):
+    """Parallel parsing should give the same XML error as the other parsers"""
+    bad_xml = tmp_path / "bad.xml"
+    with open(bad_xml, 'wb') as f:
+        f.write(b"\x3c\x61\x3e\x07\x3c\x2f\x61\x3e")
+
+    msg = "FTK report cannot be parsed. Edit the unreadable characters in the report with a text editor."
+    with pytest.raises(SystemExit, match=msg):
+        rfe.read_report(bad_xml, parse_workers=2)
+
+def test_index_bookmark_tables(parsed_report):
+    """Test that bookmark rows are summarized by bookmark id in one pass"""
+    bookmark_tables = rfe.transform_bookmark_tables(parsed_report)
+    bookmark_index = rfe.index_bookmark_tables(bookmark_tables)
+
+    assert bookmark_index['bf6001'][:2] == [110, 7]
+    assert bookmark_index['bf28001'] == [0, 1, ['file00.txt']]
+    assert 'bf27001' not in bookmark_index
+
+def test_compact_bookmark_tables_match_full_tables(parsed_report):
+    """Compact columns should summarize to the same extents as full tables"""
+    bookmark_tables = rfe.transform_bookmark_tables(parsed_report)
+    columns = rfe.transform_bookmark_tables(parsed_report, compact=True)
+
+    assert type(columns) is rfe.BookmarkColumns
+    assert rfe.index_bookmark_tables(columns) == rfe.index_bookmark_tables(
+        bookmark_tables
+    )
+
+def test_compact_columns_only_keep_zero_byte_names(parsed_report):
+    """Compact columns should only hold on to names of 0-byte files"""
+    columns = rfe.transform_bookmark_tables(parsed_report, compact=True)
+
+    zero_byte_rows = [i for i, size in enumerate(columns.sizes) if size == 0]
+
+    assert sorted(columns.zero_byte_names) == zero_byte_rows
+    assert 'file00.txt' in columns.zero_byte_names.values()
+
+def test_iterparse_compact_matches_tree_parse(parsed_report):
+    """Streaming parse with compact columns should match the tree parse"""
+    ers, columns, coll_name = rfe.iterparse_report(
+        'tests/fixtures/report/Report.xml', compact=True
+    )
+
+    assert rfe.add_extents_to_ers(ers, columns) == rfe.add_extents_to_ers(
+        rfe.create_er_list(parsed_report),
+        rfe.transform_bookmark_tables(parsed_report)
+    )
+
+def test_cache_key_changes_with_contents(tmp_path):
+    """Cache key should change when the report is edited"""
+    report = tmp_path / 'Report.xml'
+    report.write_text('<a>1</a>')
+    key = rfe.report_cache_key(report)
+
+    assert rfe.report_cache_key(report) == key
+
+    report.write_text('<a>2</a>')
+    assert rfe.report_cache_key(report) != key
+
+def test_cached_report_round_trip(parsed_report, tmp_path):
+    """Cached parse results should match a fresh parse"""
+    parsed = rfe.read_report('tests/fixtures/report/Report.xml')
+
+    assert rfe.load_cached_report(tmp_path, 'key') is None
+
+    rfe.save_cached_report(tmp_path, 'key', *parsed)
+
+    assert rfe.load_cached_report(tmp_path, 'key') == parsed
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Oldest cache entries should be removed once the cache is over its cap"""
+    for i, key in enumerate(['old', 'used', 'new']):
+        rfe.save_cached_report(tmp_path, key, [], {}, 'x' * 1000)
+        os.utime(tmp_path / f'{key}.json', ns=(i, i))
+    rfe.load_cached_report(tmp_path, 'used')
+
+    rfe.evict_cache(tmp_path, 2500)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['new.json', 'used.json']
+
+def test_batch_continues_past_bad_report(tmp_path):
+    """One unreadable report should be recorded without stopping the batch"""
+    bad_xml = tmp_path / "bad.xml"
+    with open(bad_xml, 'wb') as f:
+        f.write(b"\x3c\x61\x3e\x07\x3c\x2f\x61\x3e")
+    good_xml = pathlib.Path('tests/fixtures/report/Report.xml')
+    output = tmp_path / 'output'
+    output.mkdir()
+
+    succeeded, failed = rfe.process_batch([bad_xml, good_xml], output, batch_workers=2)
+
+    assert succeeded == {good_xml: output / 'M12345_Extents_Test.json'}
+    assert list(failed) == [bad_xml]
+    assert 'FTK report cannot be parsed' in failed[bad_xml]
+
+def test_batch_report_matches_single_report(tmp_path, expected_json):
+    """Batch mode should write the same JSON as a single run"""
+    good_xml = pathlib.Path('tests/fixtures/report/Report.xml')
+    single = tmp_path / 'single'
+    single.mkdir()
+    batch = tmp_path / 'batch'
+    batch.mkdir()
+
+    single_json = rfe.process_report(good_xml, single)
+    rfe.process_batch([good_xml], batch, batch_workers=1)
+
+    with open(single_json) as f, open(batch / single_json.name) as g:
+        assert json.load(f) == json.load(g)
+
+def test_file_warnings_sidecar_named_like_json(tmp_path):
+    """The sidecar should share the json file's underscored name"""
+    json_path = rfe.process_report(
+        pathlib.Path('tests/fixtures/report/Report.xml'), tmp_path, list_file_warnings=True
+    )
+
+    assert json_path.with_name(f'{json_path.stem}_file_warnings.tsv').exists()
+
+def test_index_sections():
+    """Pre-scan should find every page-sequence in report order"""
+    sections = rfe.index_sections('tests/fixtures/report/Report.xml')
+
+    assert list(sections) == ['TOC', 'caseInfoPage', 'bookmarksPage', 'index']
+    with open('tests/fixtures/report/Report.xml', 'rb') as f:
+        data = f.read()
+    for spans in sections.values():
+        start, end = spans[0]
+        assert data[start:end].startswith(b'<fo:page-sequence')
+        assert data[start:end].endswith(b'</fo:page-sequence>')
+
+def test_index_sections_skips_page_sequence_masters(tmp_path):
+    """Pre-scan should not take a page-sequence-master for a section"""
+    with open('tests/fixtures/report/Report.xml', 'rb') as f:
+        data = f.read()
+    master = (
+        b'<fo:page-sequence-master master-name="alternating">'
+        b'<fo:repeatable-page-master-reference master-reference="TOC"/>'
+        b'</fo:page-sequence-master>'
+    )
+    report = tmp_path / 'Report.xml'
+    report.write_bytes(data.replace(b'</fo:layout-master-set>', master + b'</fo:layout-master-set>', 1))
+
+    sections = rfe.index_sections(report)
+
+    assert list(sections) == ['TOC', 'caseInfoPage', 'bookmarksPage', 'index']
+
+def test_parse_single_section(parsed_report):
+    """Parsing one section should give the same results as the whole report"""
+    path = 'tests/fixtures/report/Report.xml'
+    sections = rfe.index_sections(path)
+
+    toc = rfe.parse_section(path, sections, 'TOC')
+    bookmarks = rfe.parse_section(path, sections, 'bookmarksPage')
+
+    assert rfe.create_er_list(toc) == rfe.create_er_list(parsed_report)
+    assert rfe.transform_bookmark_tables(bookmarks) == rfe.transform_bookmark_tables(
+        parsed_report
+    )
+    assert rfe.read_collection_title(path, sections) == 'M12345 Extents Test'
+
+def test_parse_missing_section():
+    """Asking for a section the report does not have should raise an error"""
+    path = 'tests/fixtures/report/Report.xml'
+    with pytest.raises(ValueError, match='does not contain a missing section'):
+        rfe.parse_section(path, rfe.index_sections(path), 'missing')
+
+def test_split_bookmarks_at_table_boundaries():
+    """Every chunk of the bookmarks section should start with a whole table"""
+    path = 'tests/fixtures/report/Report.xml'
+    spans = rfe.split_bookmark_sections(path, rfe.index_sections(path), 4)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    assert len(spans) > 1
+    for header, start, end, footer in spans[1:]:
+        assert data[start:end].startswith(b'<fo:table ')
+    # chunks are contiguous
+    assert all(a[2] == b[1] for a, b in zip(spans, spans[1:]))
+
+def test_parallel_bookmark_parse_matches_serial(parsed_report):
+    """Parallel parse of the bookmarks should match a serial parse exactly"""
+    path = 'tests/fixtures/report/Report.xml'
+    serial = rfe.read_report(path)
+    parallel = rfe.read_report(path, parse_workers=3)
+
+    assert parallel == serial
+    assert list(parallel[1]) == list(serial[1])
+
+def test_build_report_matches_create_report(ers_with_extents_list, expected_json):
+    """Building the report in one pass should match inserting ERs one by one"""
+    copied = [[er[0].copy(), er[1], er[2]] for er in ers_with_extents_list]
+
+    dct = rfe.build_report(ers_with_extents_list, {'title': 'coll', 'children': []})
+
+    assert dct == expected_json
+    # input is left untouched
+    assert ers_with_extents_list == copied
+
+def test_synthetic_report_totals(tmp_path):
+    """Generated reports should parse to the extents the generator wrote"""
+    report = tmp_path / 'synthetic.xml'
+    totals = generate_ftk_report(report, ers=25, files_per_er=8, depth=3)
+
+    ers, bookmark_index, coll_name = rfe.read_report(report)
+    extents = rfe.summarize_er_extents(ers, bookmark_index)
+
+    assert coll_name == 'M99999 Synthetic Test'
+    assert len(extents) == totals['ers']
+    assert sum(er[1] for er in extents) == totals['bytes']
+    assert sum(er[2] for er in extents) == totals['files']
+    assert {len(er[0]) for er in extents} == {5}
@@ -1,9 +1,15 @@
 import src.digarch_scripts.report.report_hdd_extents as rhe
+import asyncio
 import pytest
 import shutil
+import sys
+import random
 import re
 import pathlib
 import json
+import os
+import threading
+import time
 
 @pytest.fixture()
 def arranged_collection(tmp_path: pathlib.Path):
@@ -226,3 +232,386 @@ def test_create_correct_json(extracted_ers, expected_json):
     dct = rhe.create_report(extracted_ers, {'title': 'coll', 'children': []})
 
     assert dct == expected_json
+
+def test_create_report_keeps_first_seen_order():
+    """Series should be created once, in the order they are first seen"""
+    ers = [
+        ['Series 2/ER 3 Three', 3, 1, 'ER 3 Three'],
+        ['Series 1/Sub/ER 1 One', 1, 1, 'ER 1 One'],
+        ['Series 2/ER 2 Two', 2, 1, 'ER 2 Two'],
+    ]
+
+    dct = rhe.create_report(ers, {'title': 'coll', 'children': []})
+
+    assert [child['title'] for child in dct['children']] == ['Series 2', 'Series 1']
+    assert [er['title'] for er in dct['children'][0]['children']] == [
+        'ER 3 Three', 'ER 2 Two'
+    ]
+    # input is left untouched
+    assert ers[0][0] == 'Series 2/ER 3 Three'
+
+def test_find_ers_matches_glob_order(arranged_collection):
+    """ERs should be found in the same order as a recursive glob"""
+    found = [er for path, er in rhe.find_ers(arranged_collection)]
+    globbed = [
+        str(er.relative_to(arranged_collection))
+        for er in arranged_collection.glob('**/ER *')
+        if er.is_dir()
+    ]
+
+    assert found == globbed
+
+def test_find_ers_does_not_search_objects(arranged_collection):
+    """Folders inside an ER's objects folder should not be treated as ERs"""
+    nested = arranged_collection / 'Series 2' / 'ER 9 File 20, 2023' / 'objects' / 'ER 99 Nested'
+    (nested / 'objects').mkdir(parents=True)
+    (nested / 'objects' / 'file.txt').write_text('data')
+
+    found = [er for path, er in rhe.find_ers(arranged_collection)]
+
+    assert not [er for er in found if 'ER 99' in er]
+
+def test_threaded_scan_matches_serial(arranged_collection, caplog):
+    """Scanning with a thread pool should give the same ERs and warnings"""
+    serial = rhe.get_ers(arranged_collection)
+    serial_log = caplog.text
+    caplog.clear()
+
+    threaded = rhe.get_ers(arranged_collection, workers=4)
+
+    assert threaded == serial
+    assert caplog.text == serial_log
+
+def test_stat_cache_skips_unchanged_folders(arranged_collection, tmp_path, monkeypatch):
+    """A second run with the cache should not list unchanged folders again"""
+    cache_file = tmp_path / 'cache.sqlite'
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    uncached = rhe.get_ers(arranged_collection, cache=cache)
+    cache.save()
+
+    listed = []
+    list_objects_dir = rhe._list_objects_dir
+    monkeypatch.setattr(
+        rhe, '_list_objects_dir', lambda path: listed.append(path) or list_objects_dir(path)
+    )
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    cached = rhe.get_ers(arranged_collection, cache=cache)
+    cache.save()
+
+    assert cached == uncached
+    assert listed == []
+
+def test_stat_cache_rescans_changed_folders(arranged_collection, tmp_path):
+    """Folders with a new mtime should be listed again"""
+    cache_file = tmp_path / 'cache.sqlite'
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    rhe.get_ers(arranged_collection, cache=cache)
+    cache.save()
+
+    objects = next(arranged_collection.glob('**/ER 1 Text, 2023/objects'))
+    objects.joinpath('new.txt').write_text('12345')
+    os.utime(objects, ns=(0, 0))
+
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    ers = rhe.get_ers(arranged_collection, workers=2, cache=cache)
+    cache.save()
+
+    er = [er for er in ers if er[3] == 'ER 1 Text, 2023'][0]
+    assert er[1:3] == [115, 8]
+    assert cache.drift == []
+
+def test_verify_cache_reports_drift(arranged_collection, tmp_path):
+    """Verifying should catch files changed in place, which keep their folder's mtime"""
+    cache_file = tmp_path / 'cache.sqlite'
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    rhe.get_ers(arranged_collection, cache=cache)
+    cache.save()
+
+    objects = next(arranged_collection.glob('**/ER 1 Text, 2023/objects'))
+    stat = objects.stat()
+    changed = next(f for f in objects.iterdir() if f.is_file())
+    changed.write_text(changed.read_text() + 'more')
+    os.utime(objects, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    cache = rhe.StatCache(cache_file, arranged_collection)
+    stale = rhe.get_ers(arranged_collection, cache=cache)
+    assert [er for er in stale if er[3] == 'ER 1 Text, 2023'][0][1] == 110
+
+    cache = rhe.StatCache(cache_file, arranged_collection, verify=True)
+    verified = rhe.get_ers(arranged_collection, cache=cache)
+    cache.save()
+
+    assert [er for er in verified if er[3] == 'ER 1 Text, 2023'][0][1] == 114
+    assert [drift[0] for drift in cache.drift] == [str(objects.relative_to(arranged_collection))]
+
+@pytest.fixture
+def linked_collection(arranged_collection):
+    objects = next(arranged_collection.glob('**/ER 1 Text, 2023/objects'))
+    original = next(f for f in sorted(objects.iterdir()) if f.is_file() and f.stat().st_size)
+    os.link(original, objects / 'hardlink.txt')
+    os.symlink(original, objects / 'symlink.txt')
+    return arranged_collection, original.stat().st_size
+
+def test_default_accounting_counts_every_link(linked_collection):
+    """Without inode accounting, links are counted like any other file"""
+    collection, linked_size = linked_collection
+    ers = rhe.get_ers(collection)
+    er = [er for er in ers if er[3] == 'ER 1 Text, 2023'][0]
+
+    assert er == [er[0], 110 + 2 * linked_size, 9, 'ER 1 Text, 2023']
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_inode_accounting_counts_linked_files_once(linked_collection, workers, caplog):
+    """Hardlinks should be counted once per ER and symlinks logged, not followed"""
+    collection, _ = linked_collection
+    ers = rhe.get_ers(collection, workers, inodes=True)
+    er = [er for er in ers if er[3] == 'ER 1 Text, 2023'][0]
+
+    assert er[1:4] == [110, 7, 'ER 1 Text, 2023']
+    assert type(er[4]['allocated_size']) is int
+    assert 'ER 1 Text, 2023 contains the following symlink, which was not followed: symlink.txt' in caplog.text
+
+def test_inode_accounting_adds_allocated_size(linked_collection):
+    collection, _ = linked_collection
+    ers = rhe.get_ers(collection, inodes=True)
+    report = rhe.create_report(ers, {'title': 'test', 'children': []})
+
+    def er_items(item):
+        if 'er_number' in item:
+            yield item
+        for child in item.get('children', []):
+            yield from er_items(child)
+
+    assert all(type(item['allocated_size']) is int for item in er_items(report))
+
+def test_async_scan_matches_serial(arranged_collection, caplog):
+    """The async engine should find the same ERs and warnings, in the order they finish"""
+    serial = rhe.get_ers(arranged_collection)
+    serial_log = caplog.text
+    caplog.clear()
+
+    async def collect():
+        return [er async for er in rhe.get_ers_async(arranged_collection, concurrency=2)]
+
+    scanned = asyncio.run(collect())
+
+    assert sorted(scanned) == sorted(serial)
+    assert sorted(caplog.text.splitlines()) == sorted(serial_log.splitlines())
+
+def test_async_scan_caps_listings_in_flight(arranged_collection, monkeypatch):
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+    scan_tree_dir = rhe._scan_tree_dir
+
+    def counting_scan_tree_dir(*args):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return scan_tree_dir(*args)
+
+    monkeypatch.setattr(rhe, '_scan_tree_dir', counting_scan_tree_dir)
+
+    async def collect():
+        return [er async for er in rhe.scan_ers_async(arranged_collection, concurrency=2)]
+
+    asyncio.run(collect())
+
+    assert most_running == 2
+
+def test_estimate_is_exact_when_every_folder_is_sampled(arranged_collection):
+    """Small objects folders are fully listed by the samples, so the estimate is exact"""
+    exact = rhe.get_ers(arranged_collection)
+    estimated = rhe.estimate_ers(arranged_collection, samples=50, seed=0)
+
+    assert [er[:4] for er in estimated] == exact
+    for er in estimated:
+        assert er[4]['file_size_interval'] == [er[1], er[1]]
+        assert er[4]['file_count_interval'] == [er[2], er[2]]
+
+def test_estimate_samples_large_objects_folders(tmp_path, monkeypatch):
+    """Only some folders should be listed and the interval should hold the real totals"""
+    objects = tmp_path / 'objects'
+    for i in range(20):
+        for j in range(10):
+            folder = objects / f'box{i}' / f'folder{j}'
+            folder.mkdir(parents=True)
+            for k in range(i % 4 + 1):
+                folder.joinpath(f'file{k}.txt').write_text('x' * (j + 1))
+    size, count, *_ = rhe.scan_objects(str(objects))
+
+    listed = []
+    list_objects_dir = rhe._list_objects_dir
+    monkeypatch.setattr(
+        rhe, '_list_objects_dir', lambda path: listed.append(path) or list_objects_dir(path)
+    )
+    est_size, est_count, size_interval, count_interval = rhe.estimate_objects(
+        str(objects), samples=20, rng=random.Random(0)
+    )
+
+    assert len(listed) < 221
+    assert size_interval[0] <= size <= size_interval[1]
+    assert count_interval[0] <= count <= count_interval[1]
+    assert size_interval[0] <= est_size <= size_interval[1]
+
+def test_estimate_is_never_below_listed_files(tmp_path, monkeypatch):
+    """The estimate should lie in its interval and count every file that was listed"""
+    objects = tmp_path / 'objects'
+    objects.mkdir()
+    objects.joinpath('large').mkdir()
+    objects.joinpath('large', 'large.txt').write_text('x' * 10000)
+    for i in range(50):
+        folder = objects / 'small' / f'folder{i}'
+        folder.mkdir(parents=True)
+        folder.joinpath('small.txt').write_text('x')
+
+    list_objects_dir = rhe._list_objects_dir
+    for seed in range(50):
+        listed = []
+        monkeypatch.setattr(
+            rhe, '_list_objects_dir',
+            lambda path: listed.append(list_objects_dir(path)) or listed[-1]
+        )
+        size, count, size_interval, count_interval = rhe.estimate_objects(
+            str(objects), samples=10, rng=random.Random(seed)
+        )
+
+        assert size_interval[0] <= size <= size_interval[1]
+        assert count_interval[0] <= count <= count_interval[1]
+        assert size >= sum(totals.size for totals in listed)
+        assert count >= sum(totals.count for totals in listed)
+
+def test_histograms_summarize_er_files(arranged_collection):
+    """Size buckets and extensions should be collected in the same scan"""
+    ers = rhe.get_ers(arranged_collection, histograms=True)
+    er = [er for er in ers if er[3] == 'ER 1 Text, 2023'][0]
+
+    assert er[4] == {
+        'size_histogram': [[8, 2], [16, 5]],
+        'extensions': {'.txt': {'file_count': 7, 'file_size': 110}}
+    }
+
+def test_histograms_bound_extensions(tmp_path, monkeypatch):
+    """Extensions past the limit should be counted together"""
+    monkeypatch.setattr(rhe, 'MAX_EXTENSIONS', 3)
+    objects = tmp_path / 'objects'
+    for i, extension in enumerate(['.a', '.b', '.c', '.d', '.e']):
+        folder = objects / str(i)
+        folder.mkdir(parents=True)
+        folder.joinpath(f'file{extension}').write_text('x')
+
+    totals = rhe.scan_objects(str(objects))
+
+    # folders are walked in directory order, so which extensions are kept varies
+    assert len(totals.extensions) == 4
+    assert totals.extensions['other'] == [2, 2]
+
+def test_summarize_many_0_byte_files(arranged_collection, caplog):
+    """An ER with more 0-byte files than the sample should get one summary line"""
+    objects = next(arranged_collection.glob('**/ER 1 Text, 2023/objects'))
+    for i in range(50):
+        objects.joinpath(f'empty{i}.txt').touch()
+
+    file_warnings = rhe.FileWarnings(rhe.LOGGER, rhe.ER_FILE_MESSAGES, sample_size=5)
+    rhe.get_ers(arranged_collection, file_warnings=file_warnings)
+
+    er_lines = [line for line in caplog.messages if line.startswith('ER 1 Text, 2023')]
+    assert len(er_lines) == 1
+    assert er_lines[0].startswith('ER 1 Text, 2023 contains 50 0-byte files, including: ')
+
+def test_batch_reports_each_collection(arranged_collection, tmp_path):
+    """Batch mode should write the same JSON as single runs and remember durations"""
+    other_collection = tmp_path / 'other' / 'M67890_FAcomponents'
+    shutil.copytree(arranged_collection, other_collection)
+    single = tmp_path / 'single'
+    single.mkdir()
+    batch = tmp_path / 'batch'
+    batch.mkdir()
+
+    single_json = rhe.process_collection(arranged_collection, single)
+    succeeded, failed = rhe.process_batch(
+        [arranged_collection, other_collection], batch, batch_workers=2
+    )
+
+    assert succeeded == {
+        arranged_collection: batch / 'M12345_FAcomponents.json',
+        other_collection: batch / 'M67890_FAcomponents.json'
+    }
+    assert failed == {}
+    with open(single_json) as f, open(batch / single_json.name) as g:
+        assert json.load(f) == json.load(g)
+    assert set(rhe.load_durations(batch)) == {
+        str(arranged_collection.resolve()), str(other_collection.resolve())
+    }
+
+def test_batch_from_command_line(arranged_collection, tmp_path, monkeypatch, capsys):
+    """Batch mode should run from the command line with every scan option"""
+    other_collection = tmp_path / 'other' / 'M67890_FAcomponents'
+    shutil.copytree(arranged_collection, other_collection)
+    output = tmp_path / 'output'
+    output.mkdir()
+
+    monkeypatch.setattr('sys.argv', [
+        'report_hdd_extents.py',
+        '-b', str(arranged_collection), str(other_collection),
+        '-o', str(output),
+        '--workers', '2',
+        '--batch-workers', '2'
+    ])
+    rhe.main()
+
+    with open(output / 'batch_summary.json') as f:
+        summary = json.load(f)
+    assert summary['failed'] == {}
+    assert len(summary['succeeded']) == 2
+    assert '2 reports written, 0 failed' in capsys.readouterr().out
+
+def test_batch_schedules_longest_collections_first(tmp_path):
+    small, large, new = tmp_path / 'small', tmp_path / 'large', tmp_path / 'new'
+    durations = {str(small.resolve()): 1.5, str(large.resolve()): 300.0}
+
+    assert rhe.schedule_collections([small, large, new, small], durations) == [new, large, small]
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is only on Linux')
+def test_watch_updates_report(arranged_collection, tmp_path):
+    """Watching should rewrite the report after files change"""
+    objects = next(arranged_collection.glob('**/ER 1 Text, 2023/objects'))
+    output = tmp_path / 'output'
+    output.mkdir()
+
+    with rhe.CollectionWatcher(arranged_collection, output, debounce=0.05) as watcher:
+        watcher.scan()
+        objects.joinpath('new.txt').write_text('12345')
+        objects.joinpath('new_folder').mkdir()
+        objects.joinpath('new_folder', 'nested.txt').write_text('123')
+        new_er = arranged_collection / 'ER 30 New, 2023' / 'objects'
+        new_er.mkdir(parents=True)
+        new_er.joinpath('file.txt').write_text('1')
+        while watcher.process_events(timeout=1):
+            pass
+
+    with open(output / 'M12345_FAcomponents.json') as f:
+        watched = json.load(f)
+    expected = rhe.create_report(
+        rhe.get_ers(arranged_collection), {'title': 'M12345_FAcomponents', 'children': []}
+    )
+    assert watched == expected
+    assert 'ER 30 New, 2023' in json.dumps(watched)
+
+def test_watch_rejects_file_warning_list(arranged_collection, tmp_path, monkeypatch, capsys):
+    """Watch mode should refuse to list file warnings it cannot keep current"""
+    monkeypatch.setattr('sys.argv', [
+        'report_hdd_extents.py',
+        '-d', str(arranged_collection),
+        '-o', str(tmp_path),
+        '--watch',
+        '--list-file-warnings'
+    ])
+    with pytest.raises(SystemExit):
+        rhe.main()
+
+    assert '--list-file-warnings cannot be used with --watch' in capsys.readouterr().err
@@ -0,0 +1,49 @@
+import src.digarch_scripts.report.report_json as rj
+import json
+import pytest
+
+
+@pytest.fixture
+def report():
+    with open('tests/fixtures/report/report.json') as f:
+        return json.load(f)
+
+def test_output_matches_json_dump(report, tmp_path):
+    """The report should be byte for byte what json.dump writes"""
+    dest = tmp_path / 'report.json'
+    rj.write_report_json(report, dest)
+
+    assert dest.read_text() == json.dumps(report)
+
+def test_compact_output_has_no_whitespace(report, tmp_path):
+    """Compact mode should drop the whitespace between items"""
+    dest = tmp_path / 'report.json'
+    rj.write_report_json(report, dest, compact=True)
+
+    assert dest.read_text() == json.dumps(report, separators=(',', ':'))
+
+def test_failed_write_leaves_no_partial_file(tmp_path):
+    """An error while writing should not replace the existing report"""
+    dest = tmp_path / 'report.json'
+    dest.write_text('previous')
+
+    with pytest.raises(TypeError):
+        rj.write_report_json({'title': 'coll', 'children': [{'title': object()}]}, dest)
+
+    assert dest.read_text() == 'previous'
+    assert list(tmp_path.iterdir()) == [dest]
+
+def test_insert_report_item_shares_parents():
+    """Items should be nested under existing parents in first seen order"""
+    report = {'title': 'coll', 'children': [{'title': 'Series 1', 'children': []}]}
+    indexes = {}
+    rj.insert_report_item(report, ['Series 1', 'Sub A'], {'title': 'ER 1'}, indexes)
+    rj.insert_report_item(report, ['Series 2'], {'title': 'ER 2'}, indexes)
+    rj.insert_report_item(report, ['Series 1', 'Sub A'], {'title': 'ER 3'}, indexes)
+
+    assert report == {'title': 'coll', 'children': [
+        {'title': 'Series 1', 'children': [
+            {'title': 'Sub A', 'children': [{'title': 'ER 1'}, {'title': 'ER 3'}]}
+        ]},
+        {'title': 'Series 2', 'children': [{'title': 'ER 2'}]}
+    ]}